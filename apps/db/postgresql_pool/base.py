@@ -0,0 +1,140 @@
+"""
+PostgreSQL backend drawing connections from a bounded pool shared by the threads of a process.
+
+Closing a connection, which Django does at the end of each request with CONN_MAX_AGE = 0, hands it back to the pool
+instead of closing the socket. The pool is configured by the POOL entry of the database settings:
+- MAX_SIZE: connections opened at most, a checkout waits for a free one beyond that,
+- TIMEOUT: seconds a checkout waits before raising PoolTimeout,
+- IDLE_TIMEOUT: seconds after which an idle connection is closed rather than reused.
+With CONN_HEALTH_CHECKS, connections are checked with a `SELECT 1` when they leave the pool.
+
+Nothing outlives a transaction but the connection itself, so the pool also works behind pgbouncer in transaction
+mode, provided server-side cursors are disabled (DISABLE_SERVER_SIDE_CURSORS).
+"""
+
+import collections
+import os
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, max_size, timeout, idle_timeout, health_checks):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_checks = health_checks
+        self.idle = collections.deque()  # (connection, returned at), most recently returned last
+        self.size = 0  # open connections, idle or checked out
+        self.condition = threading.Condition()
+
+    def get(self, connect):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.condition.wait(remaining):
+                        raise PoolTimeout(f"No connection available within {self.timeout} seconds.")
+                if not self.idle:
+                    self.size += 1
+                    break
+                connection, returned_at = self.idle.pop()
+            # checked outside of the lock, other threads keep going during the round trip
+            if time.monotonic() - returned_at < self.idle_timeout and self.is_usable(connection):
+                return connection
+            with self.condition:
+                self.discard(connection)
+                self.condition.notify()
+        try:
+            return connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+
+    def put(self, connection):
+        with self.condition:
+            if self.reset(connection):
+                self.idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+            self.condition.notify()
+
+    def clear(self):
+        with self.condition:
+            while self.idle:
+                self.discard(self.idle.pop()[0])
+
+    def discard(self, connection):
+        # called with the condition held
+        self.size -= 1
+        try:
+            connection.close()
+        except base.Database.Error:
+            pass
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not connection.autocommit:
+                connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    @staticmethod
+    def reset(connection):
+        """Roll back what the borrower left open, False when the connection can't be reused."""
+        if connection.closed:
+            return False
+        try:
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except base.Database.Error:
+            return False
+        return connection.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        # keyed by process as well, a pool must not cross a fork
+        key = (self.alias, os.getpid())
+        with pools_lock:
+            if key not in pools:
+                options = self.settings_dict["POOL"]
+                pools[key] = ConnectionPool(
+                    max_size=options.get("MAX_SIZE", 10),
+                    timeout=options.get("TIMEOUT", 10),
+                    idle_timeout=options.get("IDLE_TIMEOUT", 300),
+                    health_checks=self.settings_dict["CONN_HEALTH_CHECKS"],
+                )
+            return pools[key]
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.get(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        self.isolation_level = self.settings_dict["OPTIONS"].get("isolation_level", connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.put(self.connection)
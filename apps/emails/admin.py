@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from apps.emails.models import Email
+
+
+@admin.register(Email)
+class EmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "recipients", "status", "attempts", "send_after", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("subject",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
@@ -0,0 +1,11 @@
+"""
+Enums fields used in Email models.
+"""
+
+from django.db import models
+
+
+class EmailStatus(models.TextChoices):
+    PENDING = "PENDING", "Pending"
+    SENT = "SENT", "Sent"
+    FAILED = "FAILED", "Failed"
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.emails.utils import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Send queued emails in batches, reusing one backend connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Emails sent per batch.")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox instead of exiting.")
+        parser.add_argument("--sleep", type=float, default=5, help="Seconds to wait when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(batch_size=options["batch_size"])
+            if sent or failed:
+                self.stdout.write(f"{sent} sent, {failed} failed")
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["sleep"])
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Email",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("subject", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("html_message", models.TextField(blank=True)),
+                ("from_email", models.CharField(blank=True, max_length=255)),
+                ("recipients", models.JSONField(default=list)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PENDING", "Pending"), ("SENT", "Sent"), ("FAILED", "Failed")],
+                        default="PENDING",
+                        max_length=10,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                ("send_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ("send_after",),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="email",
+            index=models.Index(fields=["status", "send_after"], name="emails_emai_status_4ea62c_idx"),
+        ),
+    ]
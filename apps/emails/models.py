@@ -0,0 +1,46 @@
+from django.core.mail import EmailMultiAlternatives
+from django.db import models
+from django.utils import timezone
+
+from apps.emails import enums as emails_enums
+
+
+class Email(models.Model):
+    """Outgoing email waiting to be sent by the `send_emails` worker."""
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_message = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(
+        max_length=10,
+        default=emails_enums.EmailStatus.PENDING,
+        choices=emails_enums.EmailStatus.choices,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField(default=timezone.now)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ("send_after",)
+        indexes = [models.Index(fields=["status", "send_after"])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            self.subject,
+            self.body,
+            self.from_email or None,
+            self.recipients,
+            connection=connection,
+        )
+        if self.html_message:
+            message.attach_alternative(self.html_message, "text/html")
+        return message
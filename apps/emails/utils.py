@@ -0,0 +1,101 @@
+import contextlib
+import datetime
+import smtplib
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.utils import timezone
+
+from apps.emails import enums as emails_enums
+from apps.emails.models import Email
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Drop-in replacement for `send_mail` that stores the email in the outbox instead of talking to SMTP."""
+    email = Email.objects.create(
+        subject=subject,
+        body=message,
+        html_message=html_message or "",
+        from_email=from_email or "",
+        recipients=list(recipient_list),
+    )
+    if settings.EMAIL_QUEUE_SYNC:
+        send_queued_emails()
+    return email
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+# One statement, atomic on its own: the rows locked by other workers are skipped and no transaction stays open.
+CLAIM_SQL = """
+UPDATE emails_email SET attempts = attempts + 1, send_after = %(lease)s
+WHERE id IN (
+    SELECT id FROM emails_email WHERE status = %(status)s AND send_after <= %(now)s
+    ORDER BY send_after LIMIT %(batch_size)s FOR UPDATE SKIP LOCKED
+)
+RETURNING *
+"""
+
+
+def claim_emails(batch_size):
+    """
+    Lease a batch of due emails to this worker and count the attempt.
+    Leased emails are postponed by EMAIL_QUEUE_LEASE, so the other workers skip them while they are being sent.
+    """
+    now = timezone.now()
+    params = {
+        "lease": now + datetime.timedelta(seconds=settings.EMAIL_QUEUE_LEASE),
+        "status": emails_enums.EmailStatus.PENDING,
+        "now": now,
+        "batch_size": batch_size,
+    }
+    return sorted(Email.objects.raw(CLAIM_SQL, params), key=lambda email: email.pk)
+
+
+def fail(email, error):
+    email.last_error = repr(error)
+    if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        email.status = emails_enums.EmailStatus.FAILED
+    else:
+        email.send_after = timezone.now() + retry_delay(email.attempts)
+
+
+def send_queued_emails(batch_size=None):
+    """
+    Claim one batch of due emails, then send it over a single backend connection, outside of any transaction.
+    Failed emails, including a batch whose connection could not be opened, are rescheduled with an exponential
+    backoff until EMAIL_QUEUE_MAX_ATTEMPTS is reached.
+    Returns the number of sent and failed emails.
+    """
+    emails = claim_emails(batch_size or settings.EMAIL_QUEUE_BATCH_SIZE)
+    sent = failed = 0
+    if not emails:
+        return sent, failed
+
+    try:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+    except Exception as e:  # pylint: disable=broad-except
+        failed = len(emails)
+        for email in emails:
+            fail(email, e)
+    else:
+        for email in emails:
+            try:
+                email.to_message(connection=connection).send()
+            except Exception as e:  # pylint: disable=broad-except
+                failed += 1
+                fail(email, e)
+            else:
+                sent += 1
+                email.status = emails_enums.EmailStatus.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+        # the messages are out, a server hanging up on QUIT does not fail them
+        with contextlib.suppress(smtplib.SMTPException, OSError):
+            connection.close()
+
+    Email.objects.bulk_update(emails, ["status", "last_error", "send_after", "sent_at"])
+    return sent, failed
@@ -1,8 +1,90 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 from django.contrib.auth import admin as auth_admin
 from django.contrib.auth import forms
+from django.core.paginator import Paginator
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 
+from apps.users.exports import DEFAULT_EXPORT_FIELDS, EXPORT_FORMATS, export_lines
 from apps.users.models import User
+from apps.www.replicas import read_from_replica
+
+AFTER_VAR = "after"
+
+
+def estimated_count(model):
+    """Row count estimated by the planner statistics, -1 if the table was never analyzed."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        return cursor.fetchone()[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Uses pg_class statistics instead of COUNT(*) for unfiltered querysets on large tables."""
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list.model)
+            if estimate > settings.ADMIN_LARGE_TABLE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class KeysetChangeList(ChangeList):
+    """
+    On large tables, pages are fetched with `WHERE email > <last email of the previous page>`
+    instead of an OFFSET, which costs the same on the last page as on the first one.
+    Explicit column sorting falls back to the regular numbered pagination.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        if AFTER_VAR not in (new_params or {}):
+            remove = [*(remove or []), AFTER_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        self.after = self.params.get(AFTER_VAR)
+        self.next_after = None
+        self.keyset = ORDER_VAR not in self.params and (
+            self.after is not None or estimated_count(self.model) > settings.ADMIN_LARGE_TABLE_THRESHOLD
+        )
+        if not self.keyset:
+            return super().get_results(request)
+
+        queryset = self.queryset.order_by("email")
+        if self.after:
+            queryset = queryset.filter(email__gt=self.after)
+        result_list = list(queryset[: self.list_per_page + 1])
+        if len(result_list) > self.list_per_page:
+            result_list = result_list[: self.list_per_page]
+            self.next_after = result_list[-1].email
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(self.after or self.next_after)
+        return None
+
+    def first_page_url(self):
+        return self.get_query_string()
+
+    def next_page_url(self):
+        return self.get_query_string({AFTER_VAR: self.next_after})
 
 
 @admin.register(User)
@@ -34,7 +116,7 @@ class CustomUserAdmin(auth_admin.UserAdmin):
                 ),
             },
         ),
-        ("Important dates", {"fields": ("last_login", "date_joined")}),
+        ("Important dates", {"fields": ("last_login", "date_joined", "updated_at")}),
     )
     add_fieldsets = (
         (
@@ -55,11 +137,39 @@ class CustomUserAdmin(auth_admin.UserAdmin):
     add_form = forms.UserCreationForm
     form = forms.UserChangeForm
     change_password_form = forms.AdminPasswordChangeForm
+    readonly_fields = ("updated_at",)
     list_display = ("email", "first_name", "last_name", "is_staff", "email_verified")
     list_filter = ("is_staff", "is_superuser", "is_active", "groups")
-    search_fields = ("first_name", "last_name", "email")
+    search_fields = ("first_name", "last_name", "email")  # trigram indexed, see migration 0007
     ordering = ("email",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     filter_horizontal = (
         "groups",
         "user_permissions",
     )
+    actions = ("export_csv", "export_jsonl")
+    export_fields = DEFAULT_EXPORT_FIELDS
+
+    @method_decorator(read_from_replica)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def export(self, queryset, fmt):
+        response = StreamingHttpResponse(
+            export_lines(queryset, self.export_fields, fmt), content_type=EXPORT_FORMATS[fmt]
+        )
+        filename = f"users-{timezone.now():%Y%m%d-%H%M}.{fmt}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @admin.action(description="Export selected users as CSV")
+    def export_csv(self, request, queryset):
+        return self.export(queryset, "csv")
+
+    @admin.action(description="Export selected users as JSON Lines")
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, "jsonl")
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class UsersConfig(AppConfig):
+    name = "apps.users"
+
+    def ready(self):
+        from apps.users import (  # noqa: F401 pylint: disable=import-outside-toplevel,unused-import
+            signals,
+        )
@@ -0,0 +1,20 @@
+from django.contrib.auth import backends
+
+from apps.users.cache import get_permissions, set_permissions
+from apps.www.replicas import primary_reads
+
+
+class ModelBackend(backends.ModelBackend):
+    """ModelBackend sharing permission sets across requests through the permission cache."""
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, "_perm_cache"):
+            permissions = get_permissions(user_obj.pk)
+            if permissions is None:
+                with primary_reads():
+                    permissions = super().get_all_permissions(user_obj)
+                set_permissions(user_obj.pk, permissions)
+            user_obj._perm_cache = permissions  # pylint: disable=protected-access
+        return user_obj._perm_cache  # pylint: disable=protected-access
@@ -0,0 +1,109 @@
+"""
+Caches of the users app:
+- rendered profile pages, keyed by username and invalidated on User.save(),
+- permission sets, keyed by user id and invalidated on permission and group changes, see apps.users.signals.
+  Each invalidation also bumps the user's permission version, part of the validators of the pages they see.
+Invalidations only reach the other workers through a shared cache, each cache is off when its alias is None.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.www.metrics import record_cache
+
+# v2: users pickled before User.updated_at lack the field
+PROFILE_KEY = "users:profile:v2:{}"
+HITS_KEY = "users:profile:hits"
+MISSES_KEY = "users:profile:misses"
+
+PERMISSIONS_KEY = "users:permissions:{}"
+PERMISSIONS_HITS_KEY = "users:permissions:hits"
+PERMISSIONS_MISSES_KEY = "users:permissions:misses"
+PERMISSIONS_VERSION_KEY = "users:permissions:version:{}"
+
+
+def profile_cache():
+    return caches[settings.PROFILE_CACHE_ALIAS]
+
+
+def permission_cache():
+    return caches[settings.PERMISSION_CACHE_ALIAS]
+
+
+def _incr(cache, key):
+    if not cache.add(key, 1, timeout=None):
+        cache.incr(key)
+
+
+def _stats(cache, hits_key, misses_key):
+    stats = cache.get_many([hits_key, misses_key])
+    return {"hits": stats.get(hits_key, 0), "misses": stats.get(misses_key, 0)}
+
+
+def get_profile(username):
+    if settings.PROFILE_CACHE_ALIAS is None:
+        return None
+    profile = profile_cache().get(PROFILE_KEY.format(username))
+    _incr(profile_cache(), MISSES_KEY if profile is None else HITS_KEY)
+    record_cache("profile", profile is not None)
+    return profile
+
+
+def set_profile(username, profile):
+    if settings.PROFILE_CACHE_ALIAS is None:
+        return
+    profile_cache().set(PROFILE_KEY.format(username), profile, timeout=settings.PROFILE_CACHE_TIMEOUT)
+
+
+def invalidate_profile(username):
+    if settings.PROFILE_CACHE_ALIAS is None:
+        return
+    profile_cache().delete(PROFILE_KEY.format(username))
+
+
+def profile_cache_stats():
+    return _stats(profile_cache(), HITS_KEY, MISSES_KEY)
+
+
+def get_permissions(user_id):
+    if settings.PERMISSION_CACHE_ALIAS is None:
+        return None
+    permissions = permission_cache().get(PERMISSIONS_KEY.format(user_id))
+    _incr(permission_cache(), PERMISSIONS_MISSES_KEY if permissions is None else PERMISSIONS_HITS_KEY)
+    record_cache("permissions", permissions is not None)
+    return permissions
+
+
+def set_permissions(user_id, permissions):
+    if settings.PERMISSION_CACHE_ALIAS is None:
+        return
+    permission_cache().set(PERMISSIONS_KEY.format(user_id), permissions, timeout=settings.PERMISSION_CACHE_TIMEOUT)
+
+
+def invalidate_permissions(user_ids):
+    if settings.PERMISSION_CACHE_ALIAS is None:
+        return
+    user_ids = list(user_ids)
+    permission_cache().delete_many([PERMISSIONS_KEY.format(user_id) for user_id in user_ids])
+    version = time.time_ns()
+    permission_cache().set_many(
+        {PERMISSIONS_VERSION_KEY.format(user_id): version for user_id in user_ids}, timeout=None
+    )
+
+
+def permissions_version(user):
+    """Changes whenever the permissions of `user` may have changed: their permission set without a permission cache."""
+    if settings.PERMISSION_CACHE_ALIAS is None:
+        return ",".join(sorted(user.get_all_permissions()))
+    cache, key = permission_cache(), PERMISSIONS_VERSION_KEY.format(user.pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return str(version)
+
+
+def permission_cache_stats():
+    return _stats(permission_cache(), PERMISSIONS_HITS_KEY, PERMISSIONS_MISSES_KEY)
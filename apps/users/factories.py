@@ -12,6 +12,7 @@ from apps.users.enums import Country
 from apps.users.models import User
 
 DEFAULT_PASSWORD = "YwiW%j6Hy!9bNu9Gz4"
+BIRTHDATE_RANGE = (datetime.date(1968, 1, 1), datetime.date(2000, 1, 1))
 
 
 @functools.cache
@@ -29,7 +30,7 @@ class UserFactory(factory.django.DjangoModelFactory):
     last_name = factory.Faker("last_name")
     email = factory.LazyAttribute(lambda a: "{}.{}@neuralia.co".format(a.first_name, a.last_name).lower())
     password = factory.LazyFunction(default_password)
-    birthdate = factory.fuzzy.FuzzyDate(datetime.date(1968, 1, 1), datetime.date(2000, 1, 1))
+    birthdate = factory.fuzzy.FuzzyDate(*BIRTHDATE_RANGE)
     country = random.choice(Country.values)
 
 
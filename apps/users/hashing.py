@@ -0,0 +1,187 @@
+"""
+Password hashing off the request threads.
+
+Hashing a password is pure CPU and holds the GIL all along, stalling every other thread of a threaded worker.
+With PASSWORD_HASHING_WORKERS set, hashes are computed in a pool of processes and the request thread only waits
+on a future, GIL released. At most PASSWORD_HASHING_MAX_PENDING hashes are in flight per process: over that,
+PasswordHashingBusy is raised right away rather than queueing, and PasswordHashingBusyMiddleware answers a 503.
+
+Passwords hashed with a hasher that is no longer the first of PASSWORD_HASHERS, or with outdated parameters,
+are hashed again with the preferred one in the same round trip and saved, as User.check_password() does.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    UNUSABLE_PASSWORD_PREFIX,
+    UNUSABLE_PASSWORD_SUFFIX_LENGTH,
+    get_hasher,
+    identify_hasher,
+    is_password_usable,
+)
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.shortcuts import render
+from django.utils.crypto import get_random_string
+from django.utils.deprecation import MiddlewareMixin
+
+RETRY_AFTER = 1  # seconds
+
+pool = {"pid": None, "executor": None, "slots": None}
+pool_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """More than PASSWORD_HASHING_MAX_PENDING hashes in flight in this process."""
+
+
+def encode(hasher, password, salt):
+    return hasher.encode(password, salt)
+
+
+def verify(hasher, preferred, password, encoded, salt):
+    """Whether `password` matches `encoded`, and its hash by `preferred` when `encoded` is outdated."""
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+    return is_correct, preferred.encode(password, salt) if is_correct and must_update else None
+
+
+def get_pool():
+    with pool_lock:
+        if pool["pid"] != os.getpid():
+            # forked worker, the processes belong to the parent
+            pool.update(pid=os.getpid(), executor=None, slots=None)
+        if pool["executor"] is None and settings.PASSWORD_HASHING_WORKERS:
+            # spawned rather than forked from a process running threads and holding connections
+            pool["executor"] = ProcessPoolExecutor(
+                settings.PASSWORD_HASHING_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+            pool["slots"] = threading.BoundedSemaphore(settings.PASSWORD_HASHING_MAX_PENDING)
+        return pool["executor"], pool["slots"]
+
+
+@receiver(setting_changed)
+def shutdown_pool(*, setting, **kwargs):
+    if setting in ("PASSWORD_HASHING_WORKERS", "PASSWORD_HASHING_MAX_PENDING"):
+        with pool_lock:
+            if pool["executor"] is not None and pool["pid"] == os.getpid():
+                pool["executor"].shutdown()
+            pool.update(executor=None, slots=None)
+
+
+def submit(function, *args):
+    """Run `function` in the pool, return its future or None without workers."""
+    executor, slots = get_pool()
+    if executor is None:
+        return None
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy(f"{settings.PASSWORD_HASHING_MAX_PENDING} password hashes already in flight.")
+    try:
+        future = executor.submit(function, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def call(function, *args):
+    future = submit(function, *args)
+    return function(*args) if future is None else future.result()
+
+
+async def acall(function, *args):
+    future = submit(function, *args)
+    if future is None:
+        return await sync_to_async(function, thread_sensitive=False)(*args)
+    return await asyncio.wrap_future(future)
+
+
+def encode_args(password):
+    if not isinstance(password, (bytes, str)):
+        raise TypeError(f"Password must be a string or bytes, got {type(password).__qualname__}.")
+    hasher = get_hasher()
+    return hasher, password, hasher.salt()
+
+
+def unusable_password():
+    return UNUSABLE_PASSWORD_PREFIX + get_random_string(UNUSABLE_PASSWORD_SUFFIX_LENGTH)
+
+
+def verify_args(user, password):
+    """Arguments of verify() for the password of `user`, None when it cannot match."""
+    if password is None or not is_password_usable(user.password):
+        return None
+    try:
+        hasher = identify_hasher(user.password)
+    except ValueError:
+        return None
+    preferred = get_hasher()
+    return hasher, preferred, password, user.password, preferred.salt()
+
+
+def make_password(password):
+    """django.contrib.auth.hashers.make_password(), in the pool."""
+    if password is None:
+        return unusable_password()
+    return call(encode, *encode_args(password))
+
+
+async def amake_password(password):
+    if password is None:
+        return unusable_password()
+    return await acall(encode, *encode_args(password))
+
+
+def set_password(user, password):
+    """User.set_password(), in the pool."""
+    user.password = make_password(password)
+    user._password = password  # pylint: disable=protected-access
+
+
+async def aset_password(user, password):
+    user.password = await amake_password(password)
+    user._password = password  # pylint: disable=protected-access
+
+
+def check_password(user, password):
+    """User.check_password(), in the pool. An outdated hash is replaced and saved."""
+    args = verify_args(user, password)
+    if args is None:
+        return False
+    is_correct, rehashed = call(verify, *args)
+    if rehashed:
+        user.password = rehashed
+        user.save(update_fields=["password"])
+    return is_correct
+
+
+async def acheck_password(user, password):
+    args = verify_args(user, password)
+    if args is None:
+        return False
+    is_correct, rehashed = await acall(verify, *args)
+    if rehashed:
+        user.password = rehashed
+        await sync_to_async(user.save)(update_fields=["password"])
+    return is_correct
+
+
+class PasswordHashingBusyMiddleware(MiddlewareMixin):
+    """Answer a 503 when the hashing pool is full, the client retries shortly."""
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, PasswordHashingBusy):
+            response = render(request, "core/503.html", status=503)
+            response["Retry-After"] = RETRY_AFTER
+            return response
+        return None
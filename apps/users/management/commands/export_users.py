@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.exports import (
+    DEFAULT_EXPORT_FIELDS,
+    EXPORT_FIELDS,
+    EXPORT_FORMATS,
+    export_lines,
+)
+from apps.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Stream users to a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="Destination file, stdout by default.")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--fields",
+            default=",".join(DEFAULT_EXPORT_FIELDS),
+            help=f"Comma separated columns among: {', '.join(EXPORT_FIELDS)}.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per server-side cursor read.")
+
+    def handle(self, *args, **options):
+        fields = tuple(options["fields"].split(","))
+        unknown = set(fields) - set(EXPORT_FIELDS)
+        if unknown:
+            raise CommandError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        lines = export_lines(User.objects.all(), fields, options["format"], options["chunk_size"])
+        self.stdout.ending = ""
+        output = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else self.stdout
+        start, count = time.perf_counter(), 0
+        try:
+            for count, line in enumerate(lines, start=1):
+                output.write(line)
+        finally:
+            if options["output"]:
+                output.close()
+        elapsed = time.perf_counter() - start
+
+        rows = count - 1 if options["format"] == "csv" else count
+        self.stderr.write(f"{rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)")
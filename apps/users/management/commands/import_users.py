@@ -0,0 +1,159 @@
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django import forms
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+
+from apps.users import enums as users_enums
+from apps.users.models import User
+
+
+class UserImportForm(forms.Form):
+    email = forms.EmailField()
+    first_name = forms.CharField(max_length=150, required=False)
+    last_name = forms.CharField(max_length=150, required=False)
+    country = forms.ChoiceField(choices=users_enums.Country.choices, required=False)
+    birthdate = forms.DateField(input_formats=["%Y-%m-%d", *settings.DATE_INPUT_FORMATS], required=False)
+    bio = forms.CharField(required=False)
+    password = forms.CharField(required=False, strip=False)
+
+    def clean_country(self):
+        return self.cleaned_data["country"] or users_enums.Country.FR
+
+
+def read_rows(stream, fmt, reject):
+    """Yield (line number, row) pairs without loading the whole file, JSON lines that are not objects are rejected."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                reject(line_num, {}, f"Invalid JSON: {e}")
+                continue
+            if not isinstance(row, dict):
+                reject(line_num, {}, "Not a JSON object")
+                continue
+            yield line_num, row
+
+
+def copy_value(value):
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class Command(BaseCommand):
+    help = "Import users from a CSV or JSON Lines file, hashing passwords in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON Lines file, `-` for stdin.")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Guessed from the file extension by default.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Hashing processes, 0 to hash inline.")
+        parser.add_argument("--copy", action="store_true", help="Load rows with Postgres COPY instead of INSERT.")
+        parser.add_argument("--rejects", help="Write rejected rows and their errors to this CSV file.")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or ("jsonl" if options["path"].endswith((".jsonl", ".json")) else "csv")
+        if options["copy"] and connection.vendor != "postgresql":
+            raise CommandError("--copy requires PostgreSQL.")
+
+        self.imported = self.rejected = 0
+        self.load = self.copy_users if options["copy"] else self.bulk_create_users
+
+        stream = sys.stdin if options["path"] == "-" else open(options["path"], newline="", encoding="utf-8")
+        rejects_file = open(options["rejects"], "w", newline="", encoding="utf-8") if options["rejects"] else None
+        self.rejects = csv.writer(rejects_file) if rejects_file else None
+        if self.rejects:
+            self.rejects.writerow(["line", "email", "errors"])
+
+        # workers are set up again in case they are spawned rather than forked
+        self.pool = ProcessPoolExecutor(options["workers"], initializer=django.setup) if options["workers"] else None
+        try:
+            rows = read_rows(stream, fmt, self.reject)
+            while batch := list(itertools.islice(rows, options["batch_size"])):
+                self.import_batch(batch)
+                self.stdout.write(f"{self.imported} imported, {self.rejected} rejected")
+        finally:
+            if self.pool:
+                self.pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects_file:
+                rejects_file.close()
+
+    def hash_passwords(self, passwords):
+        if self.pool is None:
+            return map(make_password, passwords)
+        return self.pool.map(make_password, passwords, chunksize=64)
+
+    def reject(self, line_num, row, errors):
+        self.rejected += 1
+        if self.rejects:
+            self.rejects.writerow([line_num, row.get("email", ""), errors])
+
+    def import_batch(self, batch):
+        valid = {}
+        for line_num, row in batch:
+            form = UserImportForm(data=row)
+            if not form.is_valid():
+                self.reject(line_num, row, json.dumps(form.errors.get_json_data()))
+                continue
+            email = User.objects.normalize_email(form.cleaned_data["email"])
+            # keyed like the users_email_lower_uniq index
+            if email.lower() in valid:
+                self.reject(line_num, row, "Duplicated email")
+                continue
+            valid[email.lower()] = (line_num, row, {**form.cleaned_data, "email": email})
+
+        taken = User.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=valid)
+        for email in taken.values_list("email_lower", flat=True):
+            line_num, row, _ = valid.pop(email)
+            self.reject(line_num, row, "That email is already taken")
+
+        passwords = [data["password"] or None for _, _, data in valid.values()]
+        users = [
+            User(
+                email=data["email"],
+                password=password,
+                first_name=data["first_name"],
+                last_name=data["last_name"],
+                country=data["country"],
+                birthdate=data["birthdate"],
+                bio=data["bio"],
+            )
+            for (_, _, data), password in zip(valid.values(), self.hash_passwords(passwords))
+        ]
+        self.load(users)
+        self.imported += len(users)
+
+    def bulk_create_users(self, users):
+        User.objects.bulk_create(users)
+
+    def copy_users(self, users):
+        fields = [f for f in User._meta.concrete_fields if not f.primary_key]
+        buffer = io.StringIO()
+        for user in users:
+            # pre_save() fills the auto_now fields as INSERT does
+            values = (f.get_db_prep_save(f.pre_save(user, True), connection) for f in fields)
+            buffer.write("\t".join(copy_value(value) for value in values) + "\n")
+        buffer.seek(0)
+        columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {User._meta.db_table} ({columns}) FROM STDIN", buffer)
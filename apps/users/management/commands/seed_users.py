@@ -0,0 +1,165 @@
+import datetime
+import io
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
+
+from apps.users import enums as users_enums
+from apps.users.factories import BIRTHDATE_RANGE, default_password
+from apps.users.management.commands.import_users import copy_value
+from apps.users.models import User
+
+NAMES_POOL_SIZE = 5000
+COLUMNS = (
+    "id",
+    "password",
+    "is_superuser",
+    "first_name",
+    "last_name",
+    "is_staff",
+    "is_active",
+    "username",
+    "email",
+    "email_verified",
+    "email_secret",
+    "date_joined",
+    "country",
+    "bio",
+    "birthdate",
+    "updated_at",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users with the field distributions of the factories, loaded with Postgres COPY. "
+        "The same seed generates the same users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("count", type=int)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=50_000)
+        parser.add_argument("--verified-ratio", type=float, default=0.5, help="Share of verified emails.")
+        parser.add_argument("--host-ratio", type=float, default=0.01, help="Share of hosts, among verified users.")
+        parser.add_argument(
+            "--defer-indexes",
+            action="store_true",
+            help="Drop the secondary indexes during the load and build them once at the end, "
+            "much faster for large loads but the table is slow to query meanwhile.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("seed_users requires PostgreSQL.")
+        self.rng = random.Random(options["seed"])
+        faker = Faker()
+        faker.seed_instance(options["seed"])
+        # Faker is slow, draw pools of names once and sample them
+        self.first_names = [copy_value(faker.first_name()) for _ in range(NAMES_POOL_SIZE)]
+        self.last_names = [copy_value(faker.last_name()) for _ in range(NAMES_POOL_SIZE)]
+        self.password = copy_value(default_password())
+        self.host_permission = Permission.objects.get(content_type__app_label="users", codename="host").pk
+        self.now = timezone.now()
+
+        start, created = time.perf_counter(), 0
+        indexes = User._meta.indexes if options["defer_indexes"] else []
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(User, index)
+        try:
+            sizes = [
+                min(options["batch_size"], options["count"] - n)
+                for n in range(0, options["count"], options["batch_size"])
+            ]
+            # the next batch is generated while the current one is copied
+            with ThreadPoolExecutor(max_workers=1) as generator:
+                pending = None
+                for size in sizes + [0]:
+                    upcoming = None
+                    if size:
+                        ids = self.reserve_ids(size)
+                        upcoming = generator.submit(
+                            self.generate_batch, ids, options["verified_ratio"], options["host_ratio"]
+                        )
+                    if pending:
+                        created += self.copy_batch(*pending.result())
+                        self.stdout.write(f"{created} users, {created / (time.perf_counter() - start):.0f} users/s")
+                    pending = upcoming
+        finally:
+            self.build_indexes(indexes)
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {User._meta.db_table}")
+        self.stdout.write(f"{created} users created in {time.perf_counter() - start:.1f}s")
+
+    def reserve_ids(self, size):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT array_agg(nextval(pg_get_serial_sequence(%s, 'id'))) FROM generate_series(1, %s)",
+                [User._meta.db_table, size],
+            )
+            return cursor.fetchone()[0]
+
+    def generate_batch(self, ids, verified_ratio, host_ratio):
+        """COPY data of the users with the given ids and of their host permissions, one column drawn at a time."""
+        rng, size = self.rng, len(ids)
+        first_names = rng.choices(self.first_names, k=size)
+        last_names = rng.choices(self.last_names, k=size)
+        countries = rng.choices(users_enums.Country.values, k=size)
+        birthdates = self.dates(*BIRTHDATE_RANGE, size)
+        joined = [self.now - datetime.timedelta(seconds=s) for s in self.uniform_ints(0, 5 * 365 * 86400, size)]
+        verified = [rng.random() < verified_ratio for _ in range(size)]
+        # mixed with the ids, so that seeding again with the same seed adds new users
+        usernames = [uuid.UUID(int=rng.getrandbits(128) ^ user_id, version=4) for user_id in ids]
+
+        users = io.StringIO()
+        for i in range(size):
+            first_name, last_name = first_names[i], last_names[i]
+            email = f"{first_name}.{last_name}.{ids[i]}@neuralia.co".lower()
+            users.write(
+                f"{ids[i]}\t{self.password}\tf\t{first_name}\t{last_name}\tf\tt\t{usernames[i]}\t{email}\t"
+                f"{'t' if verified[i] else 'f'}\t\t{joined[i].isoformat()}\t{countries[i]}\t\t{birthdates[i]}\t"
+                f"{joined[i].isoformat()}\n"
+            )
+        users.seek(0)
+
+        hosts = io.StringIO()
+        for user_id, is_verified in zip(ids, verified):
+            if is_verified and rng.random() < host_ratio:
+                hosts.write(f"{user_id}\t{self.host_permission}\n")
+        hosts.seek(0)
+        return users, hosts, size
+
+    def copy_batch(self, users, hosts, size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {User._meta.db_table} ({', '.join(COLUMNS)}) FROM STDIN", users)
+            cursor.copy_expert(
+                f"COPY {User.user_permissions.through._meta.db_table} (user_id, permission_id) FROM STDIN", hosts
+            )
+        return size
+
+    def build_indexes(self, indexes):
+        """Each index on its own connection, so that Postgres builds them in parallel."""
+
+        def build(index):
+            try:
+                with connection.schema_editor() as editor:
+                    editor.add_index(User, index)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=max(len(indexes), 1)) as builders:
+            list(builders.map(build, indexes))
+
+    def uniform_ints(self, low, high, size):
+        return [self.rng.randrange(low, high) for _ in range(size)]
+
+    def dates(self, low, high, size):
+        return [low + datetime.timedelta(days=days) for days in self.uniform_ints(0, (high - low).days + 1, size)]
@@ -0,0 +1,27 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in small batches, without locking the whole session table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        now, deleted = timezone.now(), 0
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list("session_key", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            time.sleep(options["sleep"])
+        self.stdout.write(f"{deleted} expired sessions deleted")
@@ -0,0 +1,84 @@
+"""
+Authentication middleware loading request.user from the cache instead of the database.
+
+Users are cached per session, tagged with a per-user version. Saving or deleting a user bumps the version, which
+invalidates the user in all of their sessions; logging out drops the session's entry. Cached users skip the check of
+the session against the password hash, so the cache needs to be shared by all workers: without AUTH_CACHE_ALIAS,
+request.user is loaded as by django.contrib.auth.
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import (
+    AuthenticationMiddleware as BaseAuthenticationMiddleware,
+)
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+
+from apps.www.metrics import record_cache
+from apps.www.replicas import primary_reads
+
+SESSION_USER_KEY = "users:auth:session:{}"
+USER_VERSION_KEY = "users:auth:version:{}"
+
+
+def auth_cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def bump_user_version(pk):
+    if settings.AUTH_CACHE_ALIAS is None:
+        return
+    auth_cache().set(USER_VERSION_KEY.format(pk), time.time_ns(), timeout=None)
+
+
+def forget_session_user(session_key):
+    if settings.AUTH_CACHE_ALIAS is None:
+        return
+    auth_cache().delete(SESSION_USER_KEY.format(session_key))
+
+
+def get_user(request):
+    session_key, user_id = request.session.session_key, request.session.get(auth.SESSION_KEY)
+    if session_key is None or user_id is None or settings.AUTH_CACHE_ALIAS is None:
+        with primary_reads():
+            return auth.get_user(request)
+
+    cache = auth_cache()
+    user_key, version_key = SESSION_USER_KEY.format(session_key), USER_VERSION_KEY.format(user_id)
+    cached = cache.get_many([user_key, version_key])
+    version, entry = cached.get(version_key), cached.get(user_key)
+    hit = entry is not None and entry["version"] == version and str(entry["user"].pk) == str(user_id)
+    record_cache("auth", hit)
+    if hit:
+        return entry["user"]
+
+    # auth.get_user() also checks the session against the password hash, cached users passed that check already.
+    with primary_reads():
+        user = auth.get_user(request)
+    if user.is_authenticated:
+        if version is None:
+            cache.add(version_key, time.time_ns(), timeout=None)
+            version = cache.get(version_key)
+        cache.set(user_key, {"version": version, "user": user}, timeout=settings.AUTH_CACHE_TIMEOUT)
+    return user
+
+
+def get_request_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = get_user(request)  # pylint: disable=protected-access
+    return request._cached_user  # pylint: disable=protected-access
+
+
+async def aget_request_user(request):
+    """request.user for async views, where evaluating it would query from the event loop."""
+    return await sync_to_async(get_request_user)(request)
+
+
+class AuthenticationMiddleware(BaseAuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_request_user(request))
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:10
+
+import uuid
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# The unique index is built without locking writes to the table, then attached as the constraint Django would
+# create, which only holds the lock for a catalog update. Fails if two users already share a username.
+CREATE_UNIQUE = [
+    'CREATE UNIQUE INDEX CONCURRENTLY "users_user_username_06e46fe6_uniq" ON "users_user" ("username");',
+    'ALTER TABLE "users_user" ADD CONSTRAINT "users_user_username_06e46fe6_uniq" '
+    'UNIQUE USING INDEX "users_user_username_06e46fe6_uniq";',
+]
+DROP_UNIQUE = 'ALTER TABLE "users_user" DROP CONSTRAINT "users_user_username_06e46fe6_uniq";'
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("users", "0005_remove_user_gender_user_country"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(CREATE_UNIQUE, DROP_UNIQUE)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="user",
+                    name="username",
+                    field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("email_secret", ""), _negated=True),
+                fields=["email_secret"],
+                name="users_email_secret_idx",
+            ),
+        ),
+    ]
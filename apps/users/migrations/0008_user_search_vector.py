@@ -0,0 +1,67 @@
+# Generated by Django 4.1.4 on 2026-10-18 11:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Names weigh more than the email, which weighs more than the bio.
+# The trigger keeps the vector in sync for every write path: save(), update(), bulk_create() and COPY.
+CREATE_TRIGGER = """
+CREATE FUNCTION users_user_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.first_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.last_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(NEW.email, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.bio, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_user_search_vector_trigger
+BEFORE INSERT OR UPDATE OF first_name, last_name, email, bio ON users_user
+FOR EACH ROW EXECUTE FUNCTION users_user_search_vector_update();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER users_user_search_vector_trigger ON users_user;
+DROP FUNCTION users_user_search_vector_update();
+"""
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Fill the vector of the existing rows through the trigger, one committed pk range at a time."""
+    User = apps.get_model("users", "User")
+    bounds = User.objects.aggregate(first=models.Min("pk"), last=models.Max("pk"))
+    if bounds["first"] is None:
+        return
+    for start in range(bounds["first"], bounds["last"] + 1, BACKFILL_BATCH_SIZE):
+        User.objects.filter(pk__gte=start, pk__lt=start + BACKFILL_BATCH_SIZE, search_vector__isnull=True).update(
+            email=models.F("email")
+        )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and each backfill batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ("users", "0007_user_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="user",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="users_search_vector_idx"),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.4 on 2026-10-18 14:02
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Built without locking writes to the table, the constraint is the unique index Django would create.
+# Fails if two users already share an email up to the case, they have to be merged first.
+CREATE_INDEX = 'CREATE UNIQUE INDEX CONCURRENTLY "users_email_lower_uniq" ON "users_user" (LOWER("email"));'
+DROP_INDEX = 'DROP INDEX CONCURRENTLY "users_email_lower_uniq";'
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ("users", "0008_user_search_vector"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(CREATE_INDEX, DROP_INDEX)],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="user",
+                    constraint=models.UniqueConstraint(
+                        django.db.models.functions.text.Lower("email"), name="users_email_lower_uniq"
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.4 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Existing users get the time of the migration, a constant default: Postgres adds the column without a rewrite.
+
+    dependencies = [
+        ("users", "0009_user_users_email_lower_uniq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, verbose_name="updated at"),
+        ),
+    ]
@@ -1,19 +1,40 @@
 import uuid
 
 from django.conf import settings
-from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser, UserManager
-from django.core.mail import send_mail
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower, Upper
 from django.shortcuts import reverse
 from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.html import strip_tags
 
+from apps.emails.utils import queue_mail
 from apps.users import enums as users_enums
+from apps.users.hashing import make_password
+from apps.users.tokens import make_email_verification_token
+
+# the unique constraint of the column, and the case-insensitive one
+EMAIL_UNIQUE_CONSTRAINTS = ("users_user_email_key", "users_email_lower_uniq")
+
+
+def is_email_conflict(error):
+    """Whether the IntegrityError `error` is an insert or update clashing with the email of another user."""
+    diag = getattr(error.__cause__, "diag", None)
+    return diag is not None and diag.constraint_name in EMAIL_UNIQUE_CONSTRAINTS
 
 
 class CustomUserManager(UserManager):  # Here
+    def with_email(self, email):
+        """Users whose email is `email` whatever the case, compared on LOWER(email) to use its unique index."""
+        return self.alias(email_lower=Lower("email")).filter(email_lower=Lower(Value(email)))
+
+    def get_by_natural_key(self, username):
+        return self.with_email(username).get()
+
     def _create_user(self, email, password, **extra_fields):
 
         if not email:
@@ -42,12 +63,15 @@ class CustomUserManager(UserManager):  # Here
 
 
 class User(AbstractUser):
-    username = models.UUIDField(default=uuid.uuid4, editable=False)
+    username = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     email = models.EmailField("email address", unique=True)  # Here
     email_verified = models.BooleanField(default=False)
+    # legacy verification links, superseded by signed tokens (see apps.users.tokens)
     email_secret = models.CharField(max_length=20, default="", blank=True)
 
     date_joined = models.DateTimeField("date joined", default=timezone.now)
+    # validator of the pages showing the user, see apps.www.conditional
+    updated_at = models.DateTimeField("updated at", auto_now=True)
 
     country = models.CharField(
         max_length=3,
@@ -59,6 +83,9 @@ class User(AbstractUser):
     bio = models.TextField(verbose_name="bio", blank=True)
     birthdate = models.DateField(blank=True, null=True)
 
+    # maintained by the users_user_search_vector_trigger database trigger, see migration 0008
+    search_vector = SearchVectorField(null=True, editable=False)
+
     USERNAME_FIELD = "email"  # Here
     REQUIRED_FIELDS = []
 
@@ -66,6 +93,19 @@ class User(AbstractUser):
 
     class Meta:
         permissions = (("host", "Host"),)
+        indexes = [
+            # only pending verifications carry a secret
+            models.Index(fields=["email_secret"], name="users_email_secret_idx", condition=~models.Q(email_secret="")),
+            # `icontains` lookups compare UPPER(column), as used by the admin search
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="users_email_trgm_idx"),
+            GinIndex(OpClass(Upper("first_name"), name="gin_trgm_ops"), name="users_first_name_trgm_idx"),
+            GinIndex(OpClass(Upper("last_name"), name="gin_trgm_ops"), name="users_last_name_trgm_idx"),
+            GinIndex(fields=["search_vector"], name="users_search_vector_idx"),
+        ]
+        constraints = [
+            # emails differing only by case are the same address, see CustomUserManager.with_email()
+            models.UniqueConstraint(Lower("email"), name="users_email_lower_uniq"),
+        ]
 
     def __str__(self):
         return str(self.email)
@@ -75,22 +115,18 @@ class User(AbstractUser):
 
     def verify_email(self):
         if self.email_verified is False:
-            secret = uuid.uuid4().hex[:20]
-            self.email_secret = secret
             html_message = render_to_string(
                 "emails/verify_email.html",
                 {
-                    "url": reverse("users:complete-verification", kwargs={"key": secret}),
+                    "url": reverse("users:complete-verification", kwargs={"key": make_email_verification_token(self)}),
                     "protocol": settings.PROTOCOL,
                     "fqdn": settings.FQDN,
                 },
             )
-            send_mail(
+            queue_mail(
                 "Verify Account",
                 strip_tags(html_message),
                 settings.EMAIL_FROM,
                 [self.email],
-                fail_silently=False,
                 html_message=html_message,
             )
-            self.save()
@@ -0,0 +1,40 @@
+"""
+Full-text search over users, with a trigram fallback for typos.
+"""
+
+import functools
+import operator
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Upper
+
+from apps.users.models import User
+
+# same expressions as the users_*_trgm_idx indexes
+TRIGRAM_FIELDS = ("first_name", "last_name", "email")
+
+
+def search_users(text):
+    """Users ranked by full-text relevance, or by trigram similarity when nothing matches exactly."""
+    users = User.objects.filter(is_active=True).defer("search_vector")
+    query = SearchQuery(text, config="simple", search_type="websearch")
+    matches = users.filter(search_vector=query)
+    if matches.exists():
+        return matches.annotate(rank=SearchRank(F("search_vector"), query)).order_by("-rank", "pk")
+
+    text = text.upper()
+    return (
+        users.alias(**{f"upper_{field}": Upper(field) for field in TRIGRAM_FIELDS})
+        .filter(
+            functools.reduce(
+                operator.or_, (Q(**{f"upper_{field}__trigram_word_similar": text}) for field in TRIGRAM_FIELDS)
+            )
+        )
+        .annotate(rank=Greatest(*(TrigramWordSimilarity(text, f"upper_{field}") for field in TRIGRAM_FIELDS)))
+        .order_by("-rank", "pk")
+    )
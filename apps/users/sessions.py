@@ -0,0 +1,83 @@
+"""
+Cached, database-backed sessions with fewer writes than `django.contrib.sessions.backends.cached_db`:
+- saving a session whose data did not change is a no-op,
+- the database copy is refreshed at most every SESSION_DB_WRITE_INTERVAL seconds, the cache always.
+New sessions and authentication changes (login, logout, password change) are written to the database right away,
+so losing the cache never logs anybody in or out.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+from apps.www.metrics import record_cache
+
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+def auth_state(data):
+    return [data.get(key) for key in AUTH_KEYS]
+
+
+class SessionStore(CachedDBStore):
+
+    cache_key_prefix = "apps.users.sessions"
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._snapshot = None
+        self._db_saved_at = None
+        self._db_auth = None
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:  # pylint: disable=broad-except
+            # Some backends (e.g. memcache) raise an exception on invalid cache keys, reset the session.
+            entry = None
+
+        record_cache("session", entry is not None)
+        if entry is None:
+            s = self._get_session_from_db()
+            if not s:
+                return {}
+            data = self.decode(s.session_data)
+            entry = {"data": data, "db_saved_at": time.time(), "db_auth": auth_state(data)}
+            self._cache.set(self.cache_key, entry, self.get_expiry_age(expiry=s.expire_date))
+
+        self._snapshot = self.serializer().dumps(entry["data"])
+        self._db_saved_at = entry["db_saved_at"]
+        self._db_auth = entry["db_auth"]
+        return entry["data"]
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        snapshot = self.serializer().dumps(data)
+        if not must_create and snapshot == self._snapshot:
+            return None
+
+        now = time.time()
+        if (
+            must_create
+            or self._db_saved_at is None
+            or now - self._db_saved_at >= settings.SESSION_DB_WRITE_INTERVAL
+            or auth_state(data) != self._db_auth
+        ):
+            super(CachedDBStore, self).save(must_create)  # database only
+            self._db_saved_at, self._db_auth = now, auth_state(data)
+        entry = {"data": data, "db_saved_at": self._db_saved_at, "db_auth": self._db_auth}
+        self._cache.set(self.cache_key, entry, self.get_expiry_age())
+        self._snapshot = snapshot
+        return None
+
+    def cycle_key(self):
+        # Leave the new key to the next save, so that a login costs one INSERT rather than an INSERT and an UPDATE.
+        data, key = self._session, self.session_key
+        self._session_key = None
+        self._session_cache = data
+        if key:
+            self.delete(key)
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.users.cache import invalidate_permissions, invalidate_profile
+from apps.users.middleware import bump_user_version, forget_session_user
+from apps.users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    invalidate_profile(instance.username)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if request.session.session_key:
+        forget_session_user(request.session.session_key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_permission_cache(sender, instance, **kwargs):
+    # is_active and is_superuser change the permission set as well
+    invalidate_permissions([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_permission_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_permissions([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        invalidate_permissions(pk_set)
+    elif action == "pre_clear":
+        invalidate_permissions(instance.user_set.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permission_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        groups = [instance.pk]
+    elif action in ("post_add", "post_remove"):
+        groups = pk_set
+    elif action == "pre_clear":
+        groups = list(instance.group_set.values_list("pk", flat=True))
+    else:
+        return
+    invalidate_permissions(User.objects.filter(groups__in=groups).values_list("pk", flat=True).distinct())
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group_permission_cache(sender, instance, **kwargs):
+    invalidate_permissions(instance.user_set.values_list("pk", flat=True))
@@ -0,0 +1,38 @@
+"""
+Stateless email verification tokens: the user pk and email are signed into the link,
+so nothing has to be stored at signup and verification is a primary key lookup.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+EMAIL_VERIFICATION_SALT = "apps.users.tokens.email_verification"
+
+
+def make_email_verification_token(user):
+    return signing.dumps([user.pk, user.email], salt=EMAIL_VERIFICATION_SALT)
+
+
+def email_verification_lookup(token):
+    """The user lookup of a valid token, None if it is forged or expired."""
+    try:
+        pk, email = signing.loads(token, salt=EMAIL_VERIFICATION_SALT, max_age=settings.EMAIL_VERIFICATION_TIMEOUT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    return {"pk": pk, "email": email}
+
+
+def get_user_from_email_verification_token(token):
+    """Return the user the token was issued for, or None if it is forged, expired or the email has changed."""
+    lookup = email_verification_lookup(token)
+    if lookup is None:
+        return None
+    return get_user_model().objects.filter(**lookup).first()
+
+
+async def aget_user_from_email_verification_token(token):
+    lookup = email_verification_lookup(token)
+    if lookup is None:
+        return None
+    return await get_user_model().objects.filter(**lookup).afirst()
@@ -0,0 +1,52 @@
+"""
+Conditional GET for the pages of logged-in users.
+
+The validators of a page are derived from `User.updated_at` of the users it shows and of the viewer, whose name,
+links and permissions are in the page too. Permission and group changes do not save the viewer, so the viewer's
+permission version, see apps.users.cache, is part of the validators as well. They are computed before rendering: when
+the If-None-Match or If-Modified-Since of the request still match, a 304 is sent without rendering any template.
+
+The viewer's `last_login` is part of the validators, so that a page cached for a user is never validated for another
+user logging in on the same browser. Pages with flash messages pending are always rendered.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from apps.users.cache import permissions_version
+
+
+def page_validators(viewer, *updated_at):
+    """The ETag and Last-Modified of a page shown to `viewer`, with data last updated at `updated_at`."""
+    timestamps = [*updated_at, viewer.updated_at, viewer.last_login]
+    key = ":".join(
+        [
+            settings.RELEASE,
+            str(viewer.pk),
+            permissions_version(viewer),
+            *(t.isoformat() for t in timestamps if t is not None),
+        ]
+    )
+    # weak, the pages are equivalent rather than identical byte for byte
+    etag = f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+    return etag, int(max(t for t in timestamps if t is not None).timestamp())
+
+
+def set_validators(response, etag, last_modified):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    # kept by the browser only, and revalidated each time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 (or 412) answering `request` when its conditions match the validators, None otherwise."""
+    if len(messages.get_messages(request)):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return None if response is None else set_validators(response, etag, last_modified)
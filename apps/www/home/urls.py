@@ -1,11 +1,12 @@
 from django.urls import path
 
 from apps.www.home.views import HomePageView
+from apps.www.pagecache import cache_anonymous_page
 
 # https://docs.djangoproject.com/en/dev/topics/http/urls/#url-namespaces-and-included-urlconfs
 app_name = "home"
 
 
 urlpatterns = [
-    path("", HomePageView.as_view(), name="homepage"),
+    path("", cache_anonymous_page(HomePageView.as_view()), name="homepage"),
 ]
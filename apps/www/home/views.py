@@ -4,3 +4,7 @@ from django.views.generic.base import TemplateView
 class HomePageView(TemplateView):
 
     template_name = "home/homepage.html"
+
+    async def get(self, request, *args, **kwargs):
+        # nothing to await, the template is rendered by the handler
+        return super().get(request, *args, **kwargs)
@@ -0,0 +1,281 @@
+"""
+Request instrumentation, exported in the Prometheus text format.
+
+RequestMetricsMiddleware records per URL name the latency, the database queries and their time, the template
+render time and the cache lookups. Each process aggregates its samples in memory and, with METRICS_DIR set,
+writes them to its own file there at most every METRICS_FLUSH_INTERVAL seconds. The metrics view adds up the
+files of all processes, so any worker can answer the scrape. The server folds the file of a dead worker into an
+archive file, so that counters never go back while the directory does not grow with restarted workers, see
+config/gunicorn.py.
+
+The scrapers authenticate with the METRICS_TOKEN bearer token, or come from METRICS_ALLOWED_IPS.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.backends import django as django_backend
+from django.utils.crypto import constant_time_compare
+
+from apps.www.throttling import decisions
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TYPES = {
+    "http_request_duration_seconds": "histogram",
+    "http_requests_total": "counter",
+    "db_queries_total": "counter",
+    "db_query_duration_seconds_total": "counter",
+    "template_render_duration_seconds_total": "counter",
+    "cache_lookups_total": "counter",
+    "throttle_decisions_total": "counter",
+}
+ARCHIVE_FILENAME = "metrics-archive.json"
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_lookups = defaultdict(int)  # (cache, "hit" or "miss") -> count
+
+
+current = ContextVar("request_metrics", default=None)
+
+samples = defaultdict(float)  # (metric name, sorted labels) -> value, for this process
+samples_lock = threading.Lock()
+state = {"pid": os.getpid(), "flushed_at": 0.0}
+
+
+def record_cache(cache, hit):
+    metrics = current.get()
+    if metrics is not None:
+        metrics.cache_lookups[(cache, "hit" if hit else "miss")] += 1
+
+
+def add(name, value, **labels):
+    # sorted by name, with the bucket bound last
+    samples[(name, tuple(sorted(labels.items(), key=lambda label: (label[0] == "le", label[0]))))] += value
+
+
+def collect(view, status, duration, metrics):
+    with samples_lock:
+        if state["pid"] != os.getpid():
+            # forked worker, the samples belong to the parent
+            samples.clear()
+            state.update(pid=os.getpid(), flushed_at=0.0)
+        add("http_requests_total", 1, view=view, status=str(status))
+        for bucket in LATENCY_BUCKETS:
+            # every bucket is exported, even while still empty
+            add("http_request_duration_seconds_bucket", int(duration <= bucket), view=view, le=str(bucket))
+        add("http_request_duration_seconds_bucket", 1, view=view, le="+Inf")
+        add("http_request_duration_seconds_sum", duration, view=view)
+        add("http_request_duration_seconds_count", 1, view=view)
+        add("db_queries_total", metrics.queries, view=view)
+        add("db_query_duration_seconds_total", metrics.db_time, view=view)
+        add("template_render_duration_seconds_total", metrics.template_time, view=view)
+        for (cache, result), count in metrics.cache_lookups.items():
+            add("cache_lookups_total", count, view=view, cache=cache, result=result)
+        if settings.METRICS_DIR and time.monotonic() - state["flushed_at"] >= settings.METRICS_FLUSH_INTERVAL:
+            flush()
+
+
+def snapshot():
+    """The samples of this process, including the throttling decisions which are counted apart."""
+    current_samples = dict(samples)
+    for (scope, decision), count in decisions.items():
+        current_samples[("throttle_decisions_total", (("decision", decision), ("scope", scope)))] = count
+    return current_samples
+
+
+def process_path(pid):
+    return os.path.join(settings.METRICS_DIR, f"metrics-{pid}.json")
+
+
+def read_samples(path):
+    with open(path, encoding="utf-8") as f:
+        return {(name, tuple(tuple(label) for label in labels)): value for name, labels, value in json.load(f)}
+
+
+def write_samples(path, current_samples):
+    """Replace the file at `path` atomically, so readers never see it half written."""
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump([[name, labels, value] for (name, labels), value in current_samples.items()], f)
+    os.replace(f"{path}.tmp", path)
+
+
+def flush():
+    """Write this process' samples to its file. Called with samples_lock held."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    write_samples(process_path(os.getpid()), snapshot())
+    state["flushed_at"] = time.monotonic()
+
+
+def aggregate():
+    if not settings.METRICS_DIR:
+        with samples_lock:
+            return snapshot()
+    with samples_lock:
+        flush()
+    totals = defaultdict(float)
+    for filename in os.listdir(settings.METRICS_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            process_samples = read_samples(os.path.join(settings.METRICS_DIR, filename))
+        except (OSError, ValueError):
+            continue  # removed or being replaced
+        for key, value in process_samples.items():
+            totals[key] += value
+    return totals
+
+
+def mark_process_dead(pid):
+    """Fold the samples of the dead process `pid` into the archive file and remove its own file."""
+    if not settings.METRICS_DIR:
+        return
+    path = process_path(pid)
+    try:
+        dead_samples = read_samples(path)
+    except FileNotFoundError:
+        return  # exited before its first flush
+    except ValueError:
+        dead_samples = {}  # killed while writing it
+    archive = os.path.join(settings.METRICS_DIR, ARCHIVE_FILENAME)
+    totals = defaultdict(float)
+    if os.path.exists(archive):
+        totals.update(read_samples(archive))
+    for key, value in dead_samples.items():
+        totals[key] += value
+    write_samples(archive, totals)
+    os.remove(path)
+
+
+def clear_processes():
+    """Remove the files of a previous run, when the server starts."""
+    if not settings.METRICS_DIR or not os.path.isdir(settings.METRICS_DIR):
+        return
+    for filename in os.listdir(settings.METRICS_DIR):
+        if filename.startswith("metrics-"):
+            os.remove(os.path.join(settings.METRICS_DIR, filename))
+
+
+def escape(label):
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def sort_key(item):
+    (name, labels), _ = item
+    # buckets in increasing order rather than alphabetical
+    return name, [(key, float(label.replace("+Inf", "inf")) if key == "le" else label) for key, label in labels]
+
+
+def render_metrics(totals):
+    lines, typed = [], set()
+    for (name, labels), value in sorted(totals.items(), key=sort_key):
+        family = next(family for family in TYPES if name.startswith(family))
+        if family not in typed:
+            lines.append(f"# TYPE {family} {TYPES[family]}")
+            typed.add(family)
+        rendered_labels = ",".join(f'{key}="{escape(label)}"' for key, label in labels)
+        lines.append(f"{name}{{{rendered_labels}}} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def is_scraper(request):
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    if not is_scraper(request):
+        raise Http404
+    return HttpResponse(render_metrics(aggregate()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def time_query(execute, sql, params, many, context):
+    metrics = current.get()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_timer(connection, **kwargs):
+    # for good rather than per request: async views query on the connections of other threads
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # awaited by the handler, as django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # pylint: disable=protected-access
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        metrics, start = RequestMetrics(), time.perf_counter()
+        token = current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.collect(request, response, start, metrics)
+
+    async def acall(self, request):
+        metrics, start = RequestMetrics(), time.perf_counter()
+        token = current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.collect(request, response, start, metrics)
+
+    @staticmethod
+    def collect(request, response, start, metrics):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        collect(view, response.status_code, time.perf_counter() - start, metrics)
+        return response
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = current.get()
+            if metrics is not None:
+                metrics.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template engine, with render times counted by RequestMetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
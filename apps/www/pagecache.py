@@ -0,0 +1,110 @@
+"""
+Full-page cache of the pages that all anonymous visitors see the same.
+
+Views opt in with `cache_anonymous_page`. The GETs of anonymous visitors without pending flash messages are served
+from PAGE_CACHE_ALIAS. The page is rendered once per path, language and RELEASE, so a deploy starts afresh. Of the
+query string, only the PAGE_CACHE_QUERY_PARAMS are part of the key: the other parameters do not change the page, and
+would otherwise fill the cache with copies of it. Logged-in users and other requests go through the view as usual.
+
+The personal parts of a page are left as placeholders in the cache and filled in on every hit, as edge side includes:
+- the CSRF token of `{% csrf_token %}`, which sets the visitor's CSRF cookie when missing,
+- the `{% fragment %}` templates, rendered alone with the visitor's request context: the nav of core/base.html.
+"""
+
+import asyncio
+import functools
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
+from django.utils.crypto import md5
+from django.utils.http import urlencode
+from django.utils.translation import get_language
+
+from apps.users.middleware import get_request_user
+from apps.www.metrics import record_cache
+
+PAGE_KEY = "pages:{}:{}:{}"
+# context variable of the renders for the cache, see apps.www.templatetags.pagecache
+CACHING = "page_cache_placeholders"
+CSRF_PLACEHOLDER = "CSRF-TOKEN-PLACEHOLDER"
+FRAGMENT = "<!--fragment:{}-->"
+FRAGMENT_RE = re.compile(r"<!--fragment:(?P<template>[\w./-]+)-->")
+
+
+def page_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def page_key(request):
+    params = sorted((name, value) for name, value in request.GET.items() if name in settings.PAGE_CACHE_QUERY_PARAMS)
+    url = f"{request.path}?{urlencode(params)}" if params else request.path
+    path = md5(url.encode(), usedforsecurity=False).hexdigest()
+    return PAGE_KEY.format(settings.RELEASE, get_language(), path)
+
+
+def lookup(request):
+    """The cache key of the page answering `request` and the response from the cache, no key when not cacheable."""
+    if (
+        not settings.PAGE_CACHE_TIMEOUT
+        or request.method not in ("GET", "HEAD")
+        or get_request_user(request).is_authenticated
+        or len(messages.get_messages(request))
+    ):
+        return None, None
+    key = page_key(request)
+    page = page_cache().get(key)
+    record_cache("page", page is not None)
+    return key, None if page is None else HttpResponse(fill(request, page))
+
+
+def fill(request, page):
+    page = page.replace(CSRF_PLACEHOLDER, get_token(request))
+    return FRAGMENT_RE.sub(lambda match: render_to_string(match["template"], request=request), page)
+
+
+def store(request, key, response):
+    """Render `response` with placeholders, cache it and fill it in for `request`."""
+    if not isinstance(response, TemplateResponse) or response.status_code != 200:
+        return response
+    # the view's context takes precedence over the csrf context processor
+    response.context_data = {**(response.context_data or {}), "csrf_token": CSRF_PLACEHOLDER, CACHING: True}
+    page = response.render().content.decode(response.charset)
+    page_cache().set(key, page, timeout=settings.PAGE_CACHE_TIMEOUT)
+    response.content = fill(request, page)
+    return response
+
+
+def cache_anonymous_page(view):
+    if asyncio.iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # the session, the cache and the fragments in a single thread hop
+            key, cached = await sync_to_async(lookup)(request)
+            if cached is not None:
+                return cached
+            response = await view(request, *args, **kwargs)
+            if key is None:
+                return response
+            return await sync_to_async(store)(request, key, response)
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key, cached = lookup(request)
+        if cached is not None:
+            return cached
+        response = view(request, *args, **kwargs)
+        if key is None:
+            return response
+        return store(request, key, response)
+
+    return wrapper
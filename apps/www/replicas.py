@@ -0,0 +1,117 @@
+"""
+Read replica routing.
+
+Views opt in with `read_from_replica`: their reads, including template rendering, go to the replica.
+Every other read and all writes go to the primary. A client whose request wrote anything gets a cookie pinning
+it to the primary for REPLICA_PIN_SECONDS, so it reads its own writes despite the replication lag.
+
+Rows stored in a shared cache are read from the primary with `primary_reads`, even in those views: a lagging replica
+would otherwise put back a row that a save has just invalidated, for every client and until the cache expires.
+"""
+
+import asyncio
+import contextlib
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "pin_primary"
+SAFE_METHODS = ("GET", "HEAD")
+
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica = False
+        self.wrote = False
+
+
+request_state = ContextVar("replica_request_state", default=None)
+primary_only = ContextVar("replica_primary_only", default=False)
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Route the reads of the block to the primary, for the rows that end up in a shared cache."""
+    token = primary_only.set(True)
+    try:
+        yield
+    finally:
+        primary_only.reset(token)
+
+
+def read_from_replica(view_func):
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        state = request_state.get()
+        if state is not None and request.method in SAFE_METHODS:
+            state.replica = True
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        if (
+            settings.REPLICA_DATABASE
+            and state is not None
+            and state.replica
+            and not state.pinned
+            and not primary_only.get()
+        ):
+            return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None:
+            state.wrote = True
+        # explicit, otherwise Django writes objects read from the replica back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # awaited by the handler, as django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # pylint: disable=protected-access
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_state.reset(token)
+        return self.pin(state, response)
+
+    async def acall(self, request):
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_state.reset(token)
+        return self.pin(state, response)
+
+    @staticmethod
+    def pin(state, response):
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax")
+        return response
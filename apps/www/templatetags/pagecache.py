@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from apps.www.pagecache import CACHING, FRAGMENT
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, template_name):
+    """`{% include template_name %}`, left as a placeholder in the pages cached by apps.www.pagecache."""
+    if context.get(CACHING):
+        return mark_safe(FRAGMENT.format(template_name))
+    return context.template.engine.get_template(template_name).render(context)
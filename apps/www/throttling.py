@@ -0,0 +1,116 @@
+"""
+Fixed window throttling for the authentication views.
+
+Requests are counted per window in a shared cache so that every worker sees the same budget. The count only goes
+through the cache's atomic add() and incr(), so concurrent workers never overwrite each other's requests.
+Each process also keeps the last count it has seen of each window: another worker can only have counted more
+requests, so when the local count is over the limit the request is rejected without a cache round-trip, and always
+before any password is hashed.
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+from django.utils.crypto import md5
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+LOCAL_COUNTS_MAX_SIZE = 10_000
+
+local_counts = {}
+decisions = Counter()
+
+
+def parse_rate(rate):
+    """`"10/m"` -> (10 requests, per 60 seconds)."""
+    limit, period = rate.split("/")
+    return int(limit), PERIODS[period]
+
+
+def client_ip(request):
+    """
+    The address the outermost of the THROTTLE_TRUSTED_PROXIES received the request from. Each proxy appends its peer to
+    X-Forwarded-For, the entries before those of the trusted proxies are set by the client and cannot be trusted.
+    """
+    if not settings.THROTTLE_TRUSTED_PROXIES:
+        return request.META.get("REMOTE_ADDR", "")
+    forwarded_for = [ip.strip() for ip in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if ip.strip()]
+    if not forwarded_for:
+        return request.META.get("REMOTE_ADDR", "")
+    return forwarded_for[-min(settings.THROTTLE_TRUSTED_PROXIES, len(forwarded_for))]
+
+
+def consume(scope, kind, value, rate):
+    """Count a request of `value` in the `scope`/`kind` window. Return the seconds to wait, 0 if allowed."""
+    limit, period = parse_rate(rate)
+    now = time.time()
+    window = int(now // period)
+    wait = (window + 1) * period - now
+    key = f"throttle:{scope}:{kind}:{md5(value.encode(), usedforsecurity=False).hexdigest()}:{window}"
+
+    if local_counts.get(key, 0) >= limit:
+        return wait
+
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    # the key of a window is not used after it, it expires with it
+    if cache.add(key, 1, timeout=math.ceil(wait) + 1):
+        count = 1
+    else:
+        count = cache.incr(key)
+    if len(local_counts) >= LOCAL_COUNTS_MAX_SIZE:
+        local_counts.clear()
+    local_counts[key] = count
+    return 0 if count <= limit else wait
+
+
+def throttle(scope):
+    """
+    Reject POST requests over the THROTTLE_RATES of `scope` with a 429, keyed by client IP and submitted email.
+    """
+
+    def reject(request):
+        rates = settings.THROTTLE_RATES.get(scope, {})
+        if request.method == "POST" and rates:
+            keys = {"ip": client_ip(request), "email": request.POST.get("email", "").lower()}
+            for kind, rate in rates.items():
+                if keys[kind] and (wait := consume(scope, kind, keys[kind], rate)):
+                    decisions[(scope, "rejected")] += 1
+                    logger.info("Throttled %s request by %s", scope, kind)
+                    response = render(request, "core/429.html", status=429)
+                    response["Retry-After"] = math.ceil(wait)
+                    return response
+            decisions[(scope, "allowed")] += 1
+        return None
+
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # the buckets are in the cache, and reading the POST body may block
+                response = await sync_to_async(reject)(request)
+                if response is not None:
+                    return response
+                return await view(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = reject(request)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -1,26 +1,74 @@
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
 from django import forms
+from django.contrib.auth import forms as auth_forms
+from django.db import IntegrityError, connection, transaction
+from django.template import loader
 
-from apps.users.models import User
+from apps.emails.utils import queue_mail
+from apps.users.hashing import (
+    acheck_password,
+    aset_password,
+    check_password,
+    set_password,
+)
+from apps.users.models import User, is_email_conflict
 
 
 class LoginForm(forms.Form):
+    """Validated with `is_valid()` in sync code, `await ais_valid()` in async views."""
 
     email = forms.EmailField(widget=forms.EmailInput(attrs={"placeholder": "Email"}))
     password = forms.CharField(widget=forms.PasswordInput(attrs={"placeholder": "Password"}))
 
+    async_validation = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_cache = None
+
     def clean(self):
+        # The password is hashed here only: the view logs in `get_user()` instead of calling `authenticate()`.
+        if self.async_validation:
+            return self.cleaned_data
         email = self.cleaned_data.get("email")
         password = self.cleaned_data.get("password")
         try:
-            user = User.objects.get(email=email)
-            if user.check_password(password):
+            user = User.objects.with_email(email).get()
+            if check_password(user, password):
+                self.user_cache = user
                 return self.cleaned_data
             self.add_error("password", forms.ValidationError("Password is wrong"))
         except User.DoesNotExist:
             self.add_error("email", forms.ValidationError("User does not exist"))
 
+    async def ais_valid(self):
+        """The fields first, then the user fetched with the async ORM and the password checked in the hashing pool."""
+        self.async_validation = True
+        if not self.is_valid():
+            return False
+        try:
+            user = await User.objects.with_email(self.cleaned_data["email"]).aget()
+        except User.DoesNotExist:
+            self.add_error("email", forms.ValidationError("User does not exist"))
+            return False
+        if not await acheck_password(user, self.cleaned_data["password"]):
+            self.add_error("password", forms.ValidationError("Password is wrong"))
+            return False
+        self.user_cache = user
+        return True
+
+    def get_user(self):
+        return self.user_cache
+
 
 class SignUpForm(forms.ModelForm):
+    """
+    Validated without querying the database: the email is checked by the insert of `save()` or `await asave()`,
+    which return None and add the error to the form when it is already taken.
+    """
+
     class Meta:
         model = User
         fields = ("first_name", "last_name", "email")
@@ -32,19 +80,38 @@ class SignUpForm(forms.ModelForm):
 
     password = forms.CharField(widget=forms.PasswordInput(attrs={"placeholder": "Password"}))
 
-    def clean_email(self):
-        email = self.cleaned_data.get("email")
+    def _get_validation_exclusions(self):
+        # no unique check nor constraint validation of the email, a query before the insert would race with
+        # concurrent signups: the unique indexes decide in insert()
+        return super()._get_validation_exclusions() | {"email"}
+
+    def insert(self, user):
+        # a single INSERT in autocommit, in a savepoint when a transaction encloses it so that it survives the conflict
+        savepoint = transaction.atomic() if connection.in_atomic_block else nullcontext()
         try:
-            User.objects.get(email=email)
-            raise forms.ValidationError("That email is already taken", code="existing_user")
-        except User.DoesNotExist:
-            return email
+            with savepoint:
+                user.save()
+        except IntegrityError as e:
+            if not is_email_conflict(e):
+                raise
+            self.add_error("email", forms.ValidationError("That email is already taken", code="existing_user"))
+            return None
+        return user
 
     def save(self, *args, **kwargs):
         user = super().save(commit=False)
-        password = self.cleaned_data.get("password")
-        user.set_password(password)
-        user.save()
+        set_password(user, self.cleaned_data.get("password"))
+        return self.insert(user)
+
+    async def asave(self):
+        user = super().save(commit=False)
+        await aset_password(user, self.cleaned_data.get("password"))
+        return await sync_to_async(self.insert)(user)
+
+
+class SearchForm(forms.Form):
+
+    q = forms.CharField(max_length=100, widget=forms.TextInput(attrs={"placeholder": "Search users"}))
 
 
 class UpdateProfileForm(forms.ModelForm):
@@ -64,3 +131,32 @@ class UpdateProfileForm(forms.ModelForm):
             "bio": forms.Textarea(attrs={"placeholder": "Bio", "rows": "2"}),
             "birthdate": forms.DateInput(format=("%Y-%m-%d"), attrs={"class": "form-control", "type": "date"}),
         }
+
+
+class UpdatePasswordForm(auth_forms.PasswordChangeForm):
+    """PasswordChangeForm hashing in the pool of apps.users.hashing."""
+
+    def clean_old_password(self):
+        old_password = self.cleaned_data["old_password"]
+        if not check_password(self.user, old_password):
+            raise forms.ValidationError(self.error_messages["password_incorrect"], code="password_incorrect")
+        return old_password
+
+    def save(self, commit=True):
+        set_password(self.user, self.cleaned_data["new_password1"])
+        if commit:
+            self.user.save()
+        return self.user
+
+
+class PasswordResetForm(auth_forms.PasswordResetForm):
+    def send_mail(
+        self, subject_template_name, email_template_name, context, from_email, to_email, html_email_template_name=None
+    ):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = "".join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_message = None
+        if html_email_template_name is not None:
+            html_message = loader.render_to_string(html_email_template_name, context)
+        queue_mail(subject, body, from_email, [to_email], html_message=html_message)
@@ -1,6 +1,9 @@
 from django.contrib.auth.urls import views as auth_views
 from django.urls import path, reverse_lazy
 
+from apps.www.pagecache import cache_anonymous_page
+from apps.www.throttling import throttle
+from apps.www.users.forms import PasswordResetForm
 from apps.www.users.views import (
     HostView,
     LoginView,
@@ -8,6 +11,7 @@ from apps.www.users.views import (
     UpdatePasswordView,
     UpdateProfileView,
     UserProfileView,
+    UserSearchView,
     complete_verification,
     log_out,
 )
@@ -16,20 +20,24 @@ app_name = "users"
 
 urlpatterns = [
     path("host/", HostView.as_view(), name="host"),
-    path("login/", LoginView.as_view(), name="login"),
+    path("login/", throttle("login")(cache_anonymous_page(LoginView.as_view())), name="login"),
     path("logout/", log_out, name="logout"),
-    path("signup/", SignUpView.as_view(), name="signup"),
+    path("signup/", throttle("signup")(cache_anonymous_page(SignUpView.as_view())), name="signup"),
     path("verify/<str:key>/", complete_verification, name="complete-verification"),
     path("update-profile/", UpdateProfileView.as_view(), name="update"),
     path("update-password/", UpdatePasswordView.as_view(), name="password"),
     path("profile/<slug:slug>/", UserProfileView.as_view(), name="profile"),
+    path("search/", UserSearchView.as_view(), name="search"),
     path(
         "reset/",
-        auth_views.PasswordResetView.as_view(
-            template_name="users/password_reset.html",
-            email_template_name="users/password_reset_email.html",
-            subject_template_name="users/password_reset_subject.txt",
-            success_url=reverse_lazy("users:password_reset_done"),
+        throttle("password_reset")(
+            auth_views.PasswordResetView.as_view(
+                form_class=PasswordResetForm,
+                template_name="users/password_reset.html",
+                email_template_name="users/password_reset_email.html",
+                subject_template_name="users/password_reset_subject.txt",
+                success_url=reverse_lazy("users:password_reset_done"),
+            )
         ),
         name="password_reset",
     ),
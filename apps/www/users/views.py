@@ -1,17 +1,34 @@
 # import requests  # to be changed to httpx
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.contrib.auth.views import PasswordChangeView
+from django.contrib.auth.views import PasswordChangeView, redirect_to_login
 from django.contrib.messages.views import SuccessMessageMixin
+from django.http import Http404
 from django.shortcuts import redirect, reverse
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
-from django.views.generic import DetailView, FormView, UpdateView
+from django.utils.decorators import method_decorator
+from django.views.generic import DetailView, FormView, ListView, UpdateView
 from django.views.generic.base import TemplateView
 
+from apps.users.cache import get_profile, set_profile
+from apps.users.middleware import aget_request_user
 from apps.users.models import User
-from apps.www.users.forms import LoginForm, SignUpForm, UpdateProfileForm
+from apps.users.search import search_users
+from apps.users.tokens import aget_user_from_email_verification_token
+from apps.www.conditional import not_modified, page_validators, set_validators
+from apps.www.replicas import read_from_replica
+from apps.www.users.forms import (
+    LoginForm,
+    SearchForm,
+    SignUpForm,
+    UpdatePasswordForm,
+    UpdateProfileForm,
+)
 
 
 class HostView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
@@ -19,19 +36,32 @@ class HostView(LoginRequiredMixin, PermissionRequiredMixin, TemplateView):
     template_name = "users/host.html"
     permission_required = "users.host"
 
+    def get(self, request, *args, **kwargs):
+        validators = page_validators(request.user)
+        response = not_modified(request, *validators)
+        if response is not None:
+            return response
+        return set_validators(super().get(request, *args, **kwargs), *validators)
+
 
 class LoginView(FormView):
+    """Async, throttled in apps.www.users.urls."""
 
     template_name = "users/login.html"
     form_class = LoginForm
+    http_method_names = ["get", "post", "head", "options"]
+
+    async def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-    def form_valid(self, form):
-        email = form.cleaned_data.get("email")
-        password = form.cleaned_data.get("password")
-        user = authenticate(self.request, username=email, password=password)
-        if user is not None:
-            login(self.request, user)
-        return super().form_valid(form)
+    async def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        if not await form.ais_valid():
+            return self.form_invalid(form)
+        user = form.get_user()
+        if user.is_active:
+            await sync_to_async(login)(request, user)
+        return self.form_valid(form)
 
     def get_success_url(self):
         next_arg = self.request.GET.get("next")
@@ -47,42 +77,108 @@ def log_out(request):
 
 
 class SignUpView(SuccessMessageMixin, FormView):
+    """Async, throttled in apps.www.users.urls."""
 
     template_name = "users/signup.html"
     form_class = SignUpForm
     success_url = reverse_lazy("home:homepage")
     success_message = "Successfully signed up. Please check your mailbox to complete email verification"
-
-    def form_valid(self, form):
-        form.save()
-        email = form.cleaned_data.get("email")
-        password = form.cleaned_data.get("password")
-        user = authenticate(self.request, email=email, password=password)
-        if user is not None:
-            login(self.request, user)
-        user.verify_email()
-        return super().form_valid(form)
-
-
-def complete_verification(request, key):
-    try:
-        user = User.objects.get(email_secret=key)
+    http_method_names = ["get", "post", "head", "options"]
+
+    async def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        if not form.is_valid():
+            return self.form_invalid(form)
+        user = await form.asave()
+        if user is None:
+            return self.form_invalid(form)
+        # logged in without authenticate(), which would hash the password a second time
+        await sync_to_async(login)(request, user)
+        await sync_to_async(user.verify_email)()
+        return self.form_valid(form)
+
+
+async def complete_verification(request, key):
+    user = await aget_user_from_email_verification_token(key)
+    if user is None and settings.EMAIL_SECRET_VERIFICATION and ":" not in key:
+        # links sent before signed tokens, until EMAIL_SECRET_VERIFICATION is switched off
+        user = await User.objects.filter(email_secret=key).afirst()
+    if user is not None:
         user.email_verified = True
         user.email_secret = ""
-        user.save()
+        await sync_to_async(user.save)()
         messages.success(request, "Your email is verified")
-    except User.DoesNotExist:
+    else:
         messages.warning(request, "Something gets wrong")
     return redirect(reverse("home:homepage"))
 
 
-class UserProfileView(LoginRequiredMixin, DetailView):
+class UserProfileView(DetailView):
+    """
+    Async, the login is required as LoginRequiredMixin does.
+    Read from the primary: the profile fetched on a cache miss is cached for every client, see apps.www.replicas.
+    """
 
     model = User
     template_name = "users/user-detail.html"
     context_object_name = "user_obj"
     slug_field = "username"
 
+    async def get(self, request, *args, **kwargs):
+        viewer = await aget_request_user(request)
+        if not viewer.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        self.object = await self.aget_object()
+        validators = await sync_to_async(page_validators)(viewer, self.object.updated_at)
+        response = not_modified(request, *validators)
+        if response is not None:
+            return response
+        if self.profile is None:
+            self.profile = {
+                "user": self.object,
+                "html": render_to_string("users/profile-card.html", {"user_obj": self.object}),
+            }
+            await sync_to_async(set_profile)(self.object.username, self.profile)
+        return set_validators(self.render_to_response(self.get_context_data(object=self.object)), *validators)
+
+    async def aget_object(self):
+        """From the cached profile, or a single query: a 304 renders nothing, not even the profile card."""
+        # cached under the canonical username only, so that User.save() invalidation always reaches it
+        self.profile = await sync_to_async(get_profile)(self.kwargs.get(self.slug_url_kwarg))
+        if self.profile is not None:
+            return self.profile["user"]
+        try:
+            return await self.get_queryset().aget(**{self.slug_field: self.kwargs.get(self.slug_url_kwarg)})
+        except User.DoesNotExist as e:
+            raise Http404("No user found matching the query") from e
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["profile_html"] = self.profile["html"]
+        return context
+
+
+@method_decorator(read_from_replica, name="dispatch")
+class UserSearchView(LoginRequiredMixin, ListView):
+
+    template_name = "users/search.html"
+    context_object_name = "users"
+    paginate_by = 20
+
+    def get_queryset(self):
+        self.form = SearchForm(self.request.GET or None)
+        if not self.form.is_valid():
+            return User.objects.none()
+        return search_users(self.form.cleaned_data["q"])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["form"] = self.form
+        return context
+
 
 class UpdateProfileView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
 
@@ -102,6 +198,7 @@ class UpdatePasswordView(
 ):
 
     template_name = "users/update-password.html"
+    form_class = UpdatePasswordForm
     success_message = "Password Updated"
 
     def get_success_url(self):
@@ -0,0 +1,74 @@
+"""
+Throughput under concurrency with passwords hashed in the request threads, then in the pool of apps.users.hashing.
+
+    python manage.py test benchmarks -p "bench_hashing.py"
+
+For BENCHMARK_SECONDS, BENCHMARK_THREADS threads log in with PBKDF2 while as many threads load the homepage.
+Each mode prints the logins and homepages per second, and the p95 latency of the homepage: the requests that
+never hash a password but share the process with those that do.
+"""
+
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.users import hashing
+from apps.users.factories import DEFAULT_PASSWORD, UserFactory
+
+SECONDS = float(os.getenv("BENCHMARK_SECONDS", "5"))
+THREADS = int(os.getenv("BENCHMARK_THREADS", "4"))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher"])
+class HashingBenchmark(TransactionTestCase):
+    def setUp(self):
+        self.users = UserFactory.create_batch(THREADS, password=hashing.make_password(DEFAULT_PASSWORD))
+
+    def requests(self, deadline, method, url, data=None):
+        """Latencies of the requests made until `deadline`."""
+        client, latencies = Client(), []
+        try:
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                latencies.append(time.perf_counter() - start)
+                self.assertLess(response.status_code, 400)
+        finally:
+            connections.close_all()
+        return latencies
+
+    def run_mode(self, name):
+        hashing.make_password("start the workers")
+        deadline = time.monotonic() + SECONDS
+        with ThreadPoolExecutor(2 * THREADS) as executor:
+            logins = [
+                executor.submit(
+                    self.requests,
+                    deadline,
+                    "post",
+                    reverse("users:login"),
+                    {"email": user.email, "password": DEFAULT_PASSWORD},
+                )
+                for user in self.users
+            ]
+            homepages = [executor.submit(self.requests, deadline, "get", reverse("home:homepage")) for _ in self.users]
+            logins = [latency for future in logins for latency in future.result()]
+            homepages = [latency for future in homepages for latency in future.result()]
+        p95 = statistics.quantiles(homepages, n=20)[-1] * 1000
+        print(
+            f"\n{name}: {len(logins) / SECONDS:.0f} logins/s, {len(homepages) / SECONDS:.0f} homepages/s, "
+            f"homepage p95 {p95:.1f}ms"
+        )
+
+    def test_request_threads(self):
+        with override_settings(PASSWORD_HASHING_WORKERS=0):
+            self.run_mode("request threads")
+
+    def test_process_pool(self):
+        with override_settings(PASSWORD_HASHING_WORKERS=os.cpu_count(), PASSWORD_HASHING_MAX_PENDING=THREADS):
+            self.run_mode(f"pool of {os.cpu_count()}")
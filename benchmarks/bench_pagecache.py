@@ -0,0 +1,40 @@
+"""
+Requests per second of the anonymous pages, rendered by their views then served by apps.www.pagecache.
+
+    python manage.py test benchmarks -p "bench_pagecache.py"
+
+Each page is requested for BENCHMARK_SECONDS by a new anonymous visitor each time, so that every request gets its
+own CSRF token, first with the page cache off, then on.
+"""
+
+import os
+import time
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from apps.www.pagecache import page_cache
+
+SECONDS = float(os.getenv("BENCHMARK_SECONDS", "3"))
+PAGES = ("home:homepage", "users:login", "users:signup")
+
+
+class PageCacheBenchmark(TestCase):
+    def requests_per_second(self, url):
+        client = Client()
+        client.get(url)
+        count, start = 0, time.perf_counter()
+        while time.perf_counter() - start < SECONDS:
+            client.cookies.clear()
+            self.assertEqual(client.get(url).status_code, 200)
+            count += 1
+        return count / (time.perf_counter() - start)
+
+    def test_pages(self):
+        for name in PAGES:
+            page_cache().clear()
+            with override_settings(PAGE_CACHE_TIMEOUT=0):
+                rendered = self.requests_per_second(reverse(name))
+            with override_settings(PAGE_CACHE_TIMEOUT=600):
+                cached = self.requests_per_second(reverse(name))
+            print(f"\n{name}: {rendered:.0f} req/s rendered, {cached:.0f} req/s cached ({cached / rendered:.1f}x)")
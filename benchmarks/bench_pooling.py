@@ -0,0 +1,69 @@
+"""
+Requests per second on the login and profile views, with and without the connection pool.
+
+    python manage.py test benchmarks -p "bench_pooling.py"
+
+Every request ends with the connection closed, as Django does with CONN_MAX_AGE = 0: a new connection per request
+without the pool, a checkout with it. Caches are disabled so that each request reaches the database.
+BENCHMARK_REQUESTS sets the number of requests per view and mode.
+"""
+
+import os
+import time
+
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from apps.db.postgresql_pool.base import DatabaseWrapper as PooledDatabaseWrapper
+from apps.db.postgresql_pool.base import pools
+from apps.users.factories import DEFAULT_PASSWORD, UserFactory
+
+REQUESTS = int(os.getenv("BENCHMARK_REQUESTS", "300"))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    SESSION_ENGINE="django.contrib.sessions.backends.db",
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class PoolingBenchmark(TransactionTestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.connection = connections["default"]
+
+    def tearDown(self):
+        connections["default"] = self.connection
+        pool = pools.pop(("default", os.getpid()), None)
+        if pool:
+            pool.clear()
+
+    def requests_per_second(self, pooled, method, url, data=None):
+        settings_dict = {**self.connection.settings_dict, "POOL": {"MAX_SIZE": 1}}
+        wrapper_class = PooledDatabaseWrapper if pooled else self.connection.__class__
+        connections["default"] = wrapper = wrapper_class(settings_dict, alias="default")
+        client = Client()
+        client.force_login(self.user)
+        try:
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                response = getattr(client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+                wrapper.close()
+            return REQUESTS / (time.perf_counter() - start)
+        finally:
+            wrapper.close()
+            connections["default"] = self.connection
+
+    def compare(self, name, *args):
+        without_pool = self.requests_per_second(False, *args)
+        with_pool = self.requests_per_second(True, *args)
+        print(f"\n{name}: {without_pool:.0f} req/s without pool, {with_pool:.0f} req/s with pool")
+        self.assertGreater(with_pool, without_pool)
+
+    def test_login(self):
+        data = {"email": self.user.email, "password": DEFAULT_PASSWORD}
+        self.compare("login", "post", reverse("users:login"), data)
+
+    def test_profile(self):
+        self.compare("profile", "get", self.user.get_absolute_url())
@@ -0,0 +1,61 @@
+"""
+Latency of the user search over factory-generated users.
+
+    python manage.py test benchmarks -p "bench_*.py"
+
+BENCHMARK_USERS sets the dataset size, BENCHMARK_SEARCH_P95_MS the budget.
+"""
+
+import os
+import statistics
+import time
+
+from django.db import connection
+from django.test import TestCase
+
+from apps.users.factories import UserFactory
+from apps.users.models import User
+from apps.users.search import search_users
+
+USERS = int(os.getenv("BENCHMARK_USERS", "50000"))
+P95_BUDGET_MS = float(os.getenv("BENCHMARK_SEARCH_P95_MS", "100"))
+RUNS = 20
+
+
+class SearchBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = UserFactory.build_batch(USERS)
+        for i, user in enumerate(users):
+            user.email = f"{i}.{user.email}"
+        User.objects.bulk_create(users, batch_size=1000)
+        with connection.cursor() as cursor:
+            # what autovacuum does after a bulk load: the rows are still in the pending lists of the GIN indexes,
+            # which makes the planner price them above a sequential scan
+            cursor.execute(
+                "SELECT gin_clean_pending_list(indexrelid) FROM pg_index JOIN pg_class ON pg_class.oid = indexrelid "
+                "WHERE indrelid = 'users_user'::regclass AND relam = (SELECT oid FROM pg_am WHERE amname = 'gin')"
+            )
+            cursor.execute("ANALYZE users_user")
+        cls.sample = users[USERS // 2]
+
+    def measure(self, text):
+        timings = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            users = search_users(text)
+            list(users[:20])
+            users.count()
+            timings.append((time.perf_counter() - start) * 1000)
+        quantiles = statistics.quantiles(timings, n=20)
+        p50, p95 = quantiles[9], quantiles[18]
+        print(f"\nsearch {text!r} over {USERS} users: p50 {p50:.1f} ms, p95 {p95:.1f} ms")
+        return p95
+
+    def test_full_text(self):
+        self.assertLess(self.measure(self.sample.last_name), P95_BUDGET_MS)
+
+    def test_trigram_fallback(self):
+        # one letter doubled: no full-text match, found by similarity
+        typo = self.sample.last_name + self.sample.last_name[-1]
+        self.assertLess(self.measure(typo), P95_BUDGET_MS)
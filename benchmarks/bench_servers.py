@@ -0,0 +1,165 @@
+"""
+WSGI threads against ASGI under many concurrent connections, on a local server.
+
+    python manage.py test benchmarks -p "bench_servers.py"
+
+A gunicorn worker with BENCHMARK_THREADS threads, then a uvicorn worker, serve the profile page of a logged-in user
+with caches off (benchmarks/server_settings.py), so that each request waits on Postgres several times. Both go through
+the connection pool, capped at BENCHMARK_POOL_SIZE connections. BENCHMARK_CONNECTIONS clients keep a connection each
+and send requests one after the other for BENCHMARK_SECONDS. Each server prints its requests per second, p50 and p99
+latency, and errors: failed connections, non-200 responses and requests over BENCHMARK_REQUEST_TIMEOUT.
+
+Needs gunicorn and uvicorn, skipped otherwise.
+"""
+
+import asyncio
+import importlib.util
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import unittest
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TransactionTestCase
+
+from apps.users.factories import UserFactory
+
+CONNECTIONS = int(os.getenv("BENCHMARK_CONNECTIONS", "1000"))
+SECONDS = float(os.getenv("BENCHMARK_SECONDS", "10"))
+THREADS = int(os.getenv("BENCHMARK_THREADS", "32"))
+POOL_SIZE = int(os.getenv("BENCHMARK_POOL_SIZE", "20"))
+REQUEST_TIMEOUT = float(os.getenv("BENCHMARK_REQUEST_TIMEOUT", "30"))
+HOST = "127.0.0.1"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_server(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            _, writer = await asyncio.open_connection(HOST, port)
+        except OSError:
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+    raise RuntimeError("The server did not start.")
+
+
+async def get(reader, writer, request):
+    """Send `request` and read the response, return its status code."""
+    writer.write(request)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, request, deadline, latencies, errors):
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(HOST, port), REQUEST_TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        errors.append("connect")
+        return
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            status = await asyncio.wait_for(get(reader, writer, request), REQUEST_TIMEOUT)
+            if status != 200:
+                errors.append(status)
+            latencies.append(time.perf_counter() - start)
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+        errors.append(type(e).__name__)
+    finally:
+        writer.close()
+
+
+async def load(port, request):
+    latencies, errors = [], []
+    deadline = time.monotonic() + SECONDS
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, request, deadline, latencies, errors) for _ in range(CONNECTIONS)))
+    return latencies, errors, time.perf_counter() - start
+
+
+@unittest.skipUnless(
+    importlib.util.find_spec("gunicorn") and importlib.util.find_spec("uvicorn"), "needs gunicorn and uvicorn"
+)
+class ServersBenchmark(TransactionTestCase):
+    def setUp(self):
+        # the clients' sockets, and the servers' that inherit the limit
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, min(hard, 4 * CONNECTIONS)), hard))
+        user = UserFactory()
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        self.request = f"GET {user.get_absolute_url()} HTTP/1.1\r\nHost: {HOST}\r\nCookie: {cookie}\r\n\r\n".encode()
+
+    def serve(self, name, command):
+        port = free_port()
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "benchmarks.server_settings",
+            "POSTGRES_DB": connection.settings_dict["NAME"],
+            "POSTGRES_POOL_MAX_SIZE": str(POOL_SIZE),
+            "POSTGRES_POOL_TIMEOUT": str(REQUEST_TIMEOUT),
+        }
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", *(argument.format(host=HOST, port=port) for argument in command)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(wait_for_server(port, process))
+            latencies, errors, elapsed = asyncio.run(load(port, self.request))
+        finally:
+            process.terminate()
+            process.wait()
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+        print(
+            f"\n{name}: {len(latencies) / elapsed:.0f} req/s, p50 {quantiles[49] * 1000:.0f}ms, "
+            f"p99 {quantiles[98] * 1000:.0f}ms, {len(errors)} errors over {CONNECTIONS} connections"
+        )
+        self.assertTrue(latencies)
+
+    def test_wsgi_threads(self):
+        self.serve(
+            f"gunicorn, {THREADS} threads",
+            [
+                "gunicorn",
+                "config.wsgi",
+                "--bind={host}:{port}",
+                "--worker-class=gthread",
+                f"--threads={THREADS}",
+                f"--backlog={CONNECTIONS}",
+            ],
+        )
+
+    def test_asgi(self):
+        self.serve(
+            "uvicorn",
+            [
+                "uvicorn",
+                "config.asgi:application",
+                "--host={host}",
+                "--port={port}",
+                "--no-access-log",
+                f"--backlog={CONNECTIONS}",
+            ],
+        )
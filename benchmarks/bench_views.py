@@ -0,0 +1,154 @@
+"""
+Query counts, latency and allocations of the user-facing views, checked against benchmarks/baseline.json.
+
+    pytest benchmarks/bench_views.py
+    python manage.py test benchmarks -p "bench_views.py"
+
+Each view runs BENCHMARK_RUNS times, after a warm-up, against BENCHMARK_VIEW_USERS seeded users. A view fails when it
+makes more queries than its baseline. Timings and allocations depend on the machine and the Python version: they are
+only checked with BENCHMARK_SAME_MACHINE=True, on the machine that recorded the baseline, where a view also fails when
+its p95 or its peak allocation exceed the baseline by more than BENCHMARK_TIME_TOLERANCE or BENCHMARK_MEMORY_TOLERANCE
+(ratios). Passwords use the MD5 hasher: what is measured is our code, not the password hash.
+
+BENCHMARK_UPDATE_BASELINE=True rewrites the baseline with the measured values instead of checking them.
+"""
+
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.users.factories import DEFAULT_PASSWORD, UserFactory
+from apps.users.models import User
+
+BASELINE = Path(__file__).parent / "baseline.json"
+USERS = int(os.getenv("BENCHMARK_VIEW_USERS", "2000"))
+RUNS = int(os.getenv("BENCHMARK_RUNS", "30"))
+WARMUP = 3
+TIME_TOLERANCE = float(os.getenv("BENCHMARK_TIME_TOLERANCE", "1.0"))
+MEMORY_TOLERANCE = float(os.getenv("BENCHMARK_MEMORY_TOLERANCE", "0.25"))
+UPDATE_BASELINE = os.getenv("BENCHMARK_UPDATE_BASELINE", "False") == "True"
+SAME_MACHINE = os.getenv("BENCHMARK_SAME_MACHINE", "False") == "True"
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ViewsBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = UserFactory.build_batch(USERS, password="!")
+        for i, user in enumerate(users):
+            user.email = f"{i}.{user.email}"
+        User.objects.bulk_create(users, batch_size=1000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE users_user")
+        cls.user = UserFactory(email="benchmark@neuralia.co", password=DEFAULT_PASSWORD)
+        cls.user.set_password(DEFAULT_PASSWORD)
+        cls.user.save()
+        cls.other = User.objects.get(email=users[USERS // 2].email)
+
+    def client_for(self, authenticated):
+        client = Client()
+        if authenticated:
+            client.force_login(self.user)
+        return client
+
+    def request(self, client, method, url, data=None, before=None, status=200):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, status, url)
+        return elapsed, len(queries)
+
+    def measure(self, method, url, data=None, authenticated=True, **kwargs):
+        """
+        Authenticated requests share a logged in client, anonymous ones start from a new client.
+        `data` is called with the run number when it is a function, for forms needing unique values.
+        """
+        logged_in = self.client_for(authenticated)
+
+        def run(i):
+            client = logged_in if authenticated else self.client_for(authenticated)
+            return self.request(client, method, url, data(i) if callable(data) else data, **kwargs)
+
+        timings, queries = [], 0
+        for i in range(WARMUP + RUNS):
+            elapsed, count = run(i)
+            if i >= WARMUP:
+                timings.append(elapsed * 1000)
+                queries = max(queries, count)
+
+        tracemalloc.start()
+        try:
+            run(WARMUP + RUNS)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        quantiles = statistics.quantiles(timings, n=20)
+        return {"queries": queries, "p50_ms": quantiles[9], "p95_ms": quantiles[18], "peak_kib": peak / 1024}
+
+    def check(self, name, *args, **kwargs):
+        measured = self.measure(*args, **kwargs)
+        print(
+            f"\n{name}: {measured['queries']} queries, p50 {measured['p50_ms']:.1f} ms, "
+            f"p95 {measured['p95_ms']:.1f} ms, peak {measured['peak_kib']:.0f} KiB"
+        )
+        baselines = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        if UPDATE_BASELINE:
+            baselines[name] = {key: round(value, 1) for key, value in measured.items()}
+            BASELINE.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+            return
+
+        self.assertIn(name, baselines, "No baseline, run with BENCHMARK_UPDATE_BASELINE=True.")
+        baseline = baselines[name]
+        self.assertLessEqual(measured["queries"], baseline["queries"], f"{name} makes more queries")
+        if not SAME_MACHINE:
+            return
+        self.assertLessEqual(measured["p95_ms"], baseline["p95_ms"] * (1 + TIME_TOLERANCE), f"{name} is slower")
+        self.assertLessEqual(
+            measured["peak_kib"], baseline["peak_kib"] * (1 + MEMORY_TOLERANCE), f"{name} allocates more"
+        )
+
+    def test_homepage(self):
+        self.check("homepage", "get", reverse("home:homepage"))
+
+    def test_login_page(self):
+        self.check("login_page", "get", reverse("users:login"), authenticated=False)
+
+    def test_login(self):
+        data = {"email": self.user.email, "password": DEFAULT_PASSWORD}
+        self.check("login", "post", reverse("users:login"), data, authenticated=False, status=302)
+
+    def test_signup_page(self):
+        self.check("signup_page", "get", reverse("users:signup"), authenticated=False)
+
+    def test_signup(self):
+        def data(i):
+            email = f"signup.{i}@neuralia.co"
+            return {"first_name": "Anton", "last_name": "Larikova", "email": email, "password": DEFAULT_PASSWORD}
+
+        self.check("signup", "post", reverse("users:signup"), data, authenticated=False, status=302)
+
+    def test_profile(self):
+        self.check("profile", "get", self.other.get_absolute_url())
+
+    def test_profile_cold_cache(self):
+        self.check("profile_cold_cache", "get", self.other.get_absolute_url(), before=cache.clear)
+
+    def test_update_profile_page(self):
+        self.check("update_profile_page", "get", reverse("users:update"))
+
+    def test_update_profile(self):
+        data = {"first_name": "Anton", "last_name": "Larikova", "country": "FR", "bio": "", "birthdate": ""}
+        self.check("update_profile", "post", reverse("users:update"), data, status=302)
@@ -0,0 +1,7 @@
+"""Settings of the servers started by bench_servers.py: no caches, so that every request waits on Postgres."""
+
+from config.settings.test import *  # noqa: F401,F403, pylint: disable=wildcard-import
+
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+ALLOWED_HOSTS = ["127.0.0.1"]
@@ -0,0 +1,22 @@
+"""
+gunicorn settings, for instance `gunicorn -c config/gunicorn.py config.wsgi`, or with
+`-k uvicorn.workers.UvicornWorker config.asgi` for the async views.
+
+The hooks run in the master process and keep METRICS_DIR to one file per live worker, see apps.www.metrics.
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.base")
+
+
+def on_starting(server):
+    from apps.www import metrics  # pylint: disable=import-outside-toplevel
+
+    metrics.clear_processes()
+
+
+def child_exit(server, worker):
+    from apps.www import metrics  # pylint: disable=import-outside-toplevel
+
+    metrics.mark_process_dead(worker.pid)
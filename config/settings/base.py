@@ -1,4 +1,6 @@
+import hashlib
 import os
+import subprocess
 
 from dotenv import load_dotenv
 
@@ -32,6 +34,7 @@ DJANGO_APPS = [
 LOCAL_APPS = [
     # Core apps, order is important.
     "apps.users",
+    "apps.emails",
     "apps.www",
 ]
 
@@ -40,20 +43,24 @@ THIRD_PARTY_APPS = ["fontawesomefree"]
 INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    "apps.www.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "apps.www.replicas.ReplicaMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.users.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "apps.users.hashing.PasswordHashingBusyMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Django templates with render times recorded, see apps.www.metrics.
+        "BACKEND": "apps.www.metrics.DjangoTemplates",
         "DIRS": [os.path.join(APPS_DIR, "templates")],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -81,9 +88,103 @@ DATABASES = {
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
+        "CONN_MAX_AGE": int(os.getenv("POSTGRES_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": True,
+        # Server-side cursors don't survive pgbouncer in transaction mode.
+        "DISABLE_SERVER_SIDE_CURSORS": os.getenv("POSTGRES_PGBOUNCER", "False") == "True",
     }
 }
 
+# Bounded pool of connections shared by the threads of a process, see apps.db.postgresql_pool.
+if os.getenv("POSTGRES_POOL_MAX_SIZE"):
+    DATABASES["default"]["ENGINE"] = "apps.db.postgresql_pool"
+    DATABASES["default"]["POOL"] = {
+        "MAX_SIZE": int(os.getenv("POSTGRES_POOL_MAX_SIZE")),
+        "TIMEOUT": float(os.getenv("POSTGRES_POOL_TIMEOUT", "10")),  # seconds
+        "IDLE_TIMEOUT": float(os.getenv("POSTGRES_POOL_IDLE_TIMEOUT", "300")),  # seconds
+    }
+
+# Optional read replica, used by the views opted in with apps.www.replicas.read_from_replica.
+if os.getenv("POSTGRES_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "NAME": os.getenv("POSTGRES_REPLICA_DB", DATABASES["default"]["NAME"]),
+        "USER": os.getenv("POSTGRES_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("POSTGRES_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "TEST": {"MIRROR": "default"},
+    }
+REPLICA_DATABASE = "replica" if "replica" in DATABASES else None
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))  # reads go to the primary after a write
+DATABASE_ROUTERS = ["apps.www.replicas.ReplicaRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# REDIS_URL needs the `redis` package, local memory is used otherwise.
+
+# The page cache has its own alias, so that its entries never evict sessions, users or throttle counters. With Redis,
+# PAGE_CACHE_REDIS_URL should be a separate instance with its own maxmemory and an LRU eviction policy.
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        },
+        "pages": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("PAGE_CACHE_REDIS_URL", os.getenv("REDIS_URL")),
+            "KEY_PREFIX": "pages",
+        },
+    }
+    # Sessions need a cache shared by all workers, see apps.users.sessions.
+    SESSION_ENGINE = "apps.users.sessions"
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "pages": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "pages",
+        },
+    }
+
+SESSION_DB_WRITE_INTERVAL = int(os.getenv("SESSION_DB_WRITE_INTERVAL", "300"))  # seconds
+
+# The caches below are invalidated by the process that changes the data, other workers only see the invalidation in a
+# cache they share with it: they are off (None) without Redis, rather than stale for their timeout on other workers.
+SHARED_CACHE_ALIAS = "default" if os.getenv("REDIS_URL") else None
+
+PROFILE_CACHE_ALIAS = SHARED_CACHE_ALIAS
+PROFILE_CACHE_TIMEOUT = int(os.getenv("PROFILE_CACHE_TIMEOUT", "3600"))  # seconds
+
+# Authenticated users loaded once per session rather than once per request, see apps.users.middleware.
+AUTH_CACHE_ALIAS = SHARED_CACHE_ALIAS
+AUTH_CACHE_TIMEOUT = int(os.getenv("AUTH_CACHE_TIMEOUT", "3600"))  # seconds
+
+# Pages anonymous visitors all see the same, rendered once per path, language and RELEASE, see apps.www.pagecache.
+PAGE_CACHE_ALIAS = "pages"
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "600"))  # seconds, 0 disables the cache
+# The only query parameters that change these pages, the others share the page of the path.
+PAGE_CACHE_QUERY_PARAMS = ["next"]
+
+PERMISSION_CACHE_ALIAS = SHARED_CACHE_ALIAS
+PERMISSION_CACHE_TIMEOUT = int(os.getenv("PERMISSION_CACHE_TIMEOUT", "3600"))  # seconds
+
+# Request limits of the authentication views, per client IP and per submitted email, see apps.www.throttling.
+# Behind proxies, every request comes from the last of them: the client IP is then the address that the first of the
+# THROTTLE_TRUSTED_PROXIES trusted proxies appended to X-Forwarded-For. Without it, all clients share one limit.
+THROTTLE_CACHE_ALIAS = "default"
+THROTTLE_TRUSTED_PROXIES = int(os.getenv("THROTTLE_TRUSTED_PROXIES", "0"))
+THROTTLE_RATES = {
+    "login": {"ip": "30/m", "email": "10/m"},
+    "signup": {"ip": "10/h"},
+    "password_reset": {"ip": "10/h", "email": "3/h"},
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -107,13 +208,75 @@ AUTH_PASSWORD_VALIDATORS = [
 # ------------------------------------------------------------------------------
 AUTH_USER_MODEL = "users.User"
 
+# New passwords are hashed with PASSWORD_HASHER, the others are rehashed with it on login.
+# `django.contrib.auth.hashers.ScryptPasswordHasher` is memory-hard, Argon2PasswordHasher needs `argon2-cffi`.
+PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "django.contrib.auth.hashers.PBKDF2PasswordHasher")
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [
+    hasher
+    for hasher in (
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    )
+    if hasher != PASSWORD_HASHER
+]
+
+# Passwords hashed in a pool of processes rather than in the request thread, see apps.users.hashing.
+# 0 hashes in the request thread. Over PASSWORD_HASHING_MAX_PENDING hashes in flight per process, requests get a 503.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", "0"))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv("PASSWORD_HASHING_MAX_PENDING", "16"))
+
 AUTHENTICATION_BACKENDS = (
-    # Needed to login by username in Django admin.
-    "django.contrib.auth.backends.ModelBackend",
+    # Needed to login by username in Django admin, with cached permission sets.
+    "apps.users.backends.ModelBackend",
 )
 
 LOGIN_URL = "users:login"
 
+# Flash messages travel in a cookie rather than adding a session write to each request.
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# Request metrics in the Prometheus format, see apps.www.metrics. Served to scrapers sending METRICS_TOKEN as a bearer
+# token, or to METRICS_ALLOWED_IPS (behind a proxy on the same host, every client comes from 127.0.0.1); to nobody
+# by default. Workers of a host share them through METRICS_DIR, each process only reports its own requests without it.
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # seconds
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip]
+
+
+def _build_release():
+    """The commit of a checkout, or else a hash of the code, templates and static files of the build."""
+    try:
+        git = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        return git.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    digest = hashlib.md5(usedforsecurity=False)
+    for directory in (APPS_DIR, os.path.join(ROOT_DIR, "static")):
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = sorted(name for name in dirnames if name != "__pycache__")
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, ROOT_DIR).encode())
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Deployed version, part of the ETags and cache keys of pages so that a deploy renders them again, see
+# apps.www.conditional. Derived from the build unless set, deploys should set it to the version they ship.
+RELEASE = os.getenv("RELEASE") or _build_release()
+
+# Above this many rows (planner estimate), admin changelists use estimated counts and keyset pagination.
+ADMIN_LARGE_TABLE_THRESHOLD = int(os.getenv("ADMIN_LARGE_TABLE_THRESHOLD", "100000"))
+
+EMAIL_VERIFICATION_TIMEOUT = 60 * 60 * 24 * 7  # seconds
+# Accept the legacy `email_secret` verification links still sitting in mailboxes.
+EMAIL_SECRET_VERIFICATION = os.getenv("EMAIL_SECRET_VERIFICATION", "True") == "True"
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -146,5 +309,14 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 EMAIL_FROM = "noreply@neuralia.co"
 
+# Outgoing emails are stored in the outbox and sent by `manage.py send_emails --loop`, the worker of the Procfile.
+# EMAIL_QUEUE_SYNC sends them right away, inside the request, as before.
+EMAIL_QUEUE_SYNC = os.getenv("EMAIL_QUEUE_SYNC", "False") == "True"
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv("EMAIL_QUEUE_BATCH_SIZE", "50"))
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv("EMAIL_QUEUE_MAX_ATTEMPTS", "5"))
+EMAIL_QUEUE_RETRY_DELAY = int(os.getenv("EMAIL_QUEUE_RETRY_DELAY", "60"))  # seconds, doubled on each attempt
+# A claimed batch is retried by another worker when not sent within the lease, e.g. after a crash.
+EMAIL_QUEUE_LEASE = int(os.getenv("EMAIL_QUEUE_LEASE", "300"))  # seconds
+
 PROTOCOL = "https"
 FQDN = "neuralia.co"
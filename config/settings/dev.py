@@ -31,5 +31,7 @@ AUTH_PASSWORD_VALIDATORS = []  # Avoid password strength validation in DEV.
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+EMAIL_QUEUE_SYNC = True
+
 PROTOCOL = "http"
 FQDN = "localhost:8000"
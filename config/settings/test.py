@@ -2,3 +2,38 @@ from .base import *  # noqa: F401,F403, pylint: disable=wildcard-import
 
 # Don't show logs and traceback in unit tests for readability.
 LOGGING = {}
+
+# Send queued emails immediately so tests can inspect `mail.outbox`.
+EMAIL_QUEUE_SYNC = True
+
+# Hashing passwords for real is the bulk of the time of the tests creating or logging users in.
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pages",
+    },
+}
+
+SESSION_ENGINE = "apps.users.sessions"
+
+# A single process, where the local memory cache is shared by all requests.
+AUTH_CACHE_ALIAS = "default"
+PERMISSION_CACHE_ALIAS = "default"
+PROFILE_CACHE_ALIAS = "default"
+
+# The page cache is tested on its own, see tests/www/pagecache/tests.py.
+PAGE_CACHE_TIMEOUT = 0
+
+# Throttling is tested on its own, see tests/www/throttling/tests.py.
+THROTTLE_RATES = {}
+
+# A second connection to the test database, replica routing is tested on its own, see tests/www/replicas/tests.py.
+DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}  # noqa: F405
+REPLICA_DATABASE = None
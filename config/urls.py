@@ -2,8 +2,11 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from apps.www.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
     # www.
     path("", include("apps.www.home.urls")),
     path("", include("apps.www.users.urls")),
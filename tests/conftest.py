@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+from filelock import FileLock
+
+
+def database_names():
+    """The test database name of each alias, mirrors use the name of the database they mirror."""
+    names = {}
+    for alias in connections:
+        mirror = connections[alias].settings_dict["TEST"]["MIRROR"]
+        names[alias] = connections[mirror or alias].creation._get_test_db_name()
+    return names
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(
+    request, django_test_environment, django_db_blocker, django_db_keepdb, django_db_createdb, tmp_path_factory
+):
+    """
+    Replace pytest-django's setup to share migrations between xdist workers.
+
+    Instead of each worker migrating its own database, the first worker migrates a template database and clones it
+    with `CREATE DATABASE ... TEMPLATE` for every worker. The template is kept between runs so that only new
+    migrations are applied, `--create-db` rebuilds it.
+    """
+    verbosity = request.config.option.verbose
+    workerinput = getattr(request.config, "workerinput", None)
+    if workerinput is None:
+        with django_db_blocker.unblock():
+            old_config = setup_databases(verbosity=verbosity, interactive=False, keepdb=django_db_keepdb)
+        yield
+        if not django_db_keepdb:
+            with django_db_blocker.unblock():
+                teardown_databases(old_config, verbosity=verbosity)
+        return
+
+    names = database_names()
+    # The temporary directories of the workers share their parent.
+    shared = tmp_path_factory.getbasetemp().parent
+    with django_db_blocker.unblock(), FileLock(shared / "django_db.lock"):
+        if not (shared / "django_db").exists():
+            setup_databases(verbosity=verbosity, interactive=False, keepdb=not django_db_createdb)
+            # Postgres only clones a database nobody is connected to.
+            connections.close_all()
+            for alias in connections:
+                if not connections[alias].settings_dict["TEST"]["MIRROR"]:
+                    for index in range(workerinput["workercount"]):
+                        connections[alias].creation.clone_test_db(f"gw{index}", verbosity=verbosity)
+            (shared / "django_db").touch()
+
+    old_names = {}
+    for alias in connections:
+        connection = connections[alias]
+        old_names[alias] = connection.settings_dict["NAME"]
+        connection.settings_dict["NAME"] = names[alias]
+        connection.settings_dict.update(connection.creation.get_test_db_clone_settings(workerinput["workerid"]))
+        connection.close()
+    yield
+    with django_db_blocker.unblock():
+        for alias in connections:
+            connection = connections[alias]
+            if connection.settings_dict["TEST"]["MIRROR"]:
+                connection.settings_dict["NAME"] = old_names[alias]
+            else:
+                connection.creation.destroy_test_db(old_names[alias], verbosity=verbosity, keepdb=django_db_keepdb)
+
+
+def pytest_sessionstart(session):
+    session.config._tests_started_at = time.perf_counter()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Report the wall time of the run and its speedup over the last serial run of the same tests."""
+    if hasattr(config, "workerinput"):
+        return
+    wall = time.perf_counter() - config._tests_started_at
+    reports = [report for reports in terminalreporter.stats.values() for report in reports if hasattr(report, "when")]
+    tests = len({report.nodeid for report in reports})
+    workers = len({report.node.gateway.id for report in reports if hasattr(report, "node")}) or 1
+    line = f"{tests} tests in {wall:.1f}s on {workers} worker(s)"
+    cache = getattr(config, "cache", None)
+    serial = cache.get("timing/serial", None) if cache else None
+    if cache and workers == 1:
+        cache.set("timing/serial", {"tests": tests, "wall": wall})
+    elif serial and serial["tests"] == tests:
+        line += f", {serial['wall']:.1f}s serially: {serial['wall'] / wall:.1f}x speedup"
+    terminalreporter.write_sep("-", "timing")
+    terminalreporter.write_line(line)
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+from django.db import connection
+from django.test import TestCase
+
+from apps.db.postgresql_pool.base import DatabaseWrapper, PoolTimeout, pools
+
+
+class ConnectionPoolTest(TestCase):
+    """Pooled wrappers next to the test connection, on the same database."""
+
+    def tearDown(self):
+        pools.pop((connection.alias, os.getpid())).clear()
+
+    def wrapper(self, **pool):
+        settings_dict = {**connection.settings_dict, "POOL": {"MAX_SIZE": 2, "TIMEOUT": 0.1, **pool}}
+        return DatabaseWrapper(settings_dict, alias=connection.alias)
+
+    def test_reuse(self):
+        first = self.wrapper()
+        first.ensure_connection()
+        raw_connection = first.connection
+        first.close()
+        self.assertFalse(raw_connection.closed)
+
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIs(second.connection, raw_connection)
+        second.close()
+
+    def test_max_size(self):
+        first, second = self.wrapper(MAX_SIZE=1), self.wrapper(MAX_SIZE=1)
+        first.ensure_connection()
+        with self.assertRaises(PoolTimeout):
+            self.wrapper(MAX_SIZE=1).ensure_connection()
+
+        # the pool is configured by its first wrapper, leave the waiter time to wait on a busy machine
+        pools[(connection.alias, os.getpid())].timeout = 5
+        waiter = threading.Thread(target=second.ensure_connection)
+        waiter.start()
+        time.sleep(0.1)
+        raw_connection = first.connection
+        first.close()
+        waiter.join()
+        self.assertIs(second.connection, raw_connection)
+        second.close()
+
+    def test_open_transaction_rolled_back(self):
+        first = self.wrapper(MAX_SIZE=1)
+        first.set_autocommit(False)
+        with first.cursor() as cursor:
+            cursor.execute("CREATE TEMPORARY TABLE pooled (id int)")
+        first.close()
+
+        second = self.wrapper(MAX_SIZE=1)
+        with second.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pooled')")
+            self.assertEqual(cursor.fetchone(), (None,))
+        second.close()
+
+    def test_idle_timeout(self):
+        first = self.wrapper(IDLE_TIMEOUT=0)
+        first.ensure_connection()
+        raw_connection = first.connection
+        first.close()
+
+        second = self.wrapper(IDLE_TIMEOUT=0)
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw_connection)
+        self.assertTrue(raw_connection.closed)
+        second.close()
+
+    def test_health_check(self):
+        first = self.wrapper(MAX_SIZE=1)
+        first.ensure_connection()
+        raw_connection = first.connection
+        first.close()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", [raw_connection.info.backend_pid])
+
+        second = self.wrapper(MAX_SIZE=1)
+        with second.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIsNot(second.connection, raw_connection)
+        second.close()
@@ -0,0 +1,136 @@
+import datetime
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.emails.enums import EmailStatus
+from apps.emails.models import Email
+from apps.emails.utils import queue_mail, send_queued_emails
+
+
+class FlakySMTPBackend(EmailBackend):
+    """locmem backend standing in for an SMTP server refusing some recipients."""
+
+    opened = 0
+
+    def open(self):
+        FlakySMTPBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(to.startswith("refused") for to in message.to):
+                raise ConnectionRefusedError("421 try again later")
+        return super().send_messages(messages)
+
+
+class DownSMTPBackend(EmailBackend):
+    """locmem backend standing in for an unreachable SMTP server."""
+
+    def open(self):
+        raise ConnectionRefusedError("111 connection refused")
+
+
+class LeaseCheckingBackend(EmailBackend):
+    """locmem backend recording whether the emails it sends are still due for the other workers."""
+
+    due_while_sending = None
+
+    def send_messages(self, messages):
+        LeaseCheckingBackend.due_while_sending = Email.objects.filter(
+            status=EmailStatus.PENDING, send_after__lte=timezone.now()
+        ).count()
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_QUEUE_SYNC=False)
+class QueueMailTest(TestCase):
+    def test_queue_mail_does_not_send(self):
+        email = queue_mail("Subject", "Body", "from@neuralia.co", ["to@neuralia.co"], html_message="<p>Body</p>")
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(email.status, EmailStatus.PENDING)
+        self.assertEqual(email.recipients, ["to@neuralia.co"])
+
+    @override_settings(EMAIL_QUEUE_SYNC=True)
+    def test_sync_fallback(self):
+        email = queue_mail("Subject", "Body", "from@neuralia.co", ["to@neuralia.co"], html_message="<p>Body</p>")
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailStatus.SENT)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][0], "<p>Body</p>")
+
+
+@override_settings(
+    EMAIL_QUEUE_SYNC=False,
+    EMAIL_BACKEND="tests.emails.tests.FlakySMTPBackend",
+    EMAIL_QUEUE_MAX_ATTEMPTS=2,
+    EMAIL_QUEUE_RETRY_DELAY=60,
+)
+class SendQueuedEmailsTest(TestCase):
+    def setUp(self):
+        FlakySMTPBackend.opened = 0
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(5):
+            queue_mail("Subject", "Body", None, [f"user{i}@neuralia.co"])
+        self.assertEqual(send_queued_emails(batch_size=3), (3, 0))
+        self.assertEqual(send_queued_emails(batch_size=3), (2, 0))
+        self.assertEqual(FlakySMTPBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(Email.objects.filter(status=EmailStatus.SENT).count(), 5)
+
+    def test_retry_with_backoff(self):
+        email = queue_mail("Subject", "Body", None, ["refused@neuralia.co"])
+        self.assertEqual(send_queued_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailStatus.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("421 try again later", email.last_error)
+        self.assertGreater(email.send_after, timezone.now() + datetime.timedelta(seconds=50))
+
+        # not due yet
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+        Email.objects.update(send_after=timezone.now())
+        self.assertEqual(send_queued_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailStatus.FAILED)
+        self.assertEqual(email.attempts, 2)
+
+    @override_settings(EMAIL_BACKEND="tests.emails.tests.DownSMTPBackend")
+    def test_connection_error_fails_the_batch(self):
+        for i in range(2):
+            queue_mail("Subject", "Body", None, [f"user{i}@neuralia.co"])
+        self.assertEqual(send_queued_emails(), (0, 2))
+        for email in Email.objects.all():
+            self.assertEqual(email.status, EmailStatus.PENDING)
+            self.assertEqual(email.attempts, 1)
+            self.assertIn("111 connection refused", email.last_error)
+            self.assertGreater(email.send_after, timezone.now() + datetime.timedelta(seconds=50))
+
+    @override_settings(EMAIL_BACKEND="tests.emails.tests.LeaseCheckingBackend", EMAIL_QUEUE_LEASE=300)
+    def test_claimed_emails_are_leased(self):
+        queue_mail("Subject", "Body", None, ["user@neuralia.co"])
+        queue_mail("Subject", "Body", None, ["other@neuralia.co"])
+        self.assertEqual(send_queued_emails(batch_size=1), (1, 0))
+        # the claimed email was no longer due for another worker, the other one still was
+        self.assertEqual(LeaseCheckingBackend.due_while_sending, 1)
+
+    @override_settings(EMAIL_BACKEND="tests.emails.tests.DownSMTPBackend")
+    def test_command_survives_connection_errors(self):
+        queue_mail("Subject", "Body", None, ["user@neuralia.co"])
+        out = StringIO()
+        call_command("send_emails", stdout=out)
+        self.assertIn("0 sent, 1 failed", out.getvalue())
+
+    def test_command(self):
+        queue_mail("Subject", "Body", None, ["user@neuralia.co"])
+        queue_mail("Subject", "Body", None, ["refused@neuralia.co"])
+        out = StringIO()
+        call_command("send_emails", stdout=out)
+        self.assertIn("1 sent, 1 failed", out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
@@ -1,16 +1,50 @@
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.contrib.auth.hashers import (
+    check_password,
+    get_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.contrib.auth.models import Group, Permission
+from django.contrib.sessions.models import Session
 from django.core import mail
-from django.db import IntegrityError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
 from django.shortcuts import reverse
-from django.test import TestCase
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
+from apps.emails.utils import send_queued_emails
+from apps.users import hashing
+from apps.users.admin import CustomUserAdmin
+from apps.users.cache import permission_cache, permission_cache_stats
+from apps.users.enums import Country
 from apps.users.factories import (
+    BIRTHDATE_RANGE,
     DEFAULT_PASSWORD,
     HostFactory,
     UserFactory,
     UserWithVerifiedEmailFactory,
 )
-from apps.users.models import User
+from apps.users.middleware import SESSION_USER_KEY, auth_cache
+from apps.users.models import User, is_email_conflict
+from apps.users.search import TRIGRAM_FIELDS, search_users
+from apps.users.sessions import SessionStore
+from apps.users.tokens import (
+    get_user_from_email_verification_token,
+    make_email_verification_token,
+)
 
 
 class ManagerTest(TestCase):
@@ -26,6 +60,11 @@ class ManagerTest(TestCase):
         self.assertTrue(user.is_staff)
         self.assertTrue(user.is_superuser)
 
+    def test_get_by_natural_key_ignores_case(self):
+        user = UserFactory(email="user@neuralia.co")
+        self.assertEqual(User.objects.get_by_natural_key("User@Neuralia.co"), user)
+        self.assertEqual(list(User.objects.with_email("USER@NEURALIA.CO")), [user])
+
 
 class ModelTest(TestCase):
     def test_email_is_unique(self):
@@ -33,6 +72,12 @@ class ModelTest(TestCase):
         with self.assertRaises(IntegrityError):
             User.objects.create_user(email="user@neuralia.co", password=DEFAULT_PASSWORD)
 
+    def test_email_is_unique_whatever_the_case(self):
+        User.objects.create_user(email="user@neuralia.co", password=DEFAULT_PASSWORD)
+        with self.assertRaises(IntegrityError) as cm:
+            User.objects.create_user(email="User@neuralia.co", password=DEFAULT_PASSWORD)
+        self.assertTrue(is_email_conflict(cm.exception))
+
     def test_get_absolute_url(self):
         user = UserFactory()
         self.assertEqual(
@@ -49,9 +94,9 @@ class ModelTest(TestCase):
 
     def test_unverified_email(self):
         user = UserFactory()
-        user.verify_email()
-        user.refresh_from_db()
-        self.assertIsNotNone(user.email_secret)
+        with self.settings(EMAIL_QUEUE_SYNC=False), self.assertNumQueries(1):  # outbox insert, no user update
+            user.verify_email()
+        send_queued_emails()
         self.assertEqual(len(mail.outbox), 1)
         email = mail.outbox[0]
         self.assertEqual(email.to[0], user.email)
@@ -59,11 +104,575 @@ class ModelTest(TestCase):
             "Verify Account",
             email.subject,
         )
-        self.assertIn(
-            f"{settings.PROTOCOL}://{settings.FQDN}/verify/{user.email_secret}",
-            email.alternatives[0][0],
-        )
+        # the token embeds a timestamp, compare what it resolves to
+        url = reverse("users:complete-verification", kwargs={"key": "KEY"})
+        pattern = re.escape(f"{settings.PROTOCOL}://{settings.FQDN}{url}").replace("KEY", "([^/]+)")
+        match = re.search(pattern, email.alternatives[0][0])
+        self.assertEqual(get_user_from_email_verification_token(match.group(1)), user)
 
     def test_host_permissions(self):
         user = HostFactory()
         self.assertEqual(user.get_user_permissions(), {"users.host"})
+
+
+class EmailVerificationTokenTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def test_valid_token(self):
+        token = make_email_verification_token(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_from_email_verification_token(token), self.user)
+
+    def test_forged_token(self):
+        token = make_email_verification_token(self.user)
+        self.assertIsNone(get_user_from_email_verification_token(token[:-1]))
+        self.assertIsNone(get_user_from_email_verification_token("99999"))
+
+    def test_expired_token(self):
+        token = make_email_verification_token(self.user)
+        with self.settings(EMAIL_VERIFICATION_TIMEOUT=-1):
+            self.assertIsNone(get_user_from_email_verification_token(token))
+
+    def test_email_changed(self):
+        token = make_email_verification_token(self.user)
+        self.user.email = "changed@neuralia.co"
+        self.user.save()
+        self.assertIsNone(get_user_from_email_verification_token(token))
+
+
+class QueryPlanTest(TestCase):
+    """
+    Tables are tiny in tests, so sequential scans are disabled to check the planner *can* use an index.
+    Without a matching index, Postgres still falls back to a Seq Scan.
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertNotIn("Seq Scan", plan)
+        self.assertIn(index_name, plan)
+
+    def test_username_is_unique(self):
+        user = UserFactory()
+        with self.assertRaises(IntegrityError):
+            UserFactory(username=user.username)
+
+    def test_profile_lookup_uses_index(self):
+        user = UserFactory()
+        # unique constraint index, named users_user_username_<hash>_uniq by Django
+        self.assertUsesIndex(User.objects.filter(username=user.username), "users_user_username_")
+
+    def test_email_secret_lookup_uses_partial_index(self):
+        UserFactory(email_secret="0123456789abcdef0123")
+        self.assertUsesIndex(User.objects.filter(email_secret="0123456789abcdef0123"), "users_email_secret_idx")
+
+    def test_admin_search_uses_trigram_indexes(self):
+        UserFactory()
+        for field in ("email", "first_name", "last_name"):
+            with self.subTest(field=field):
+                self.assertUsesIndex(User.objects.filter(**{f"{field}__icontains": "eura"}), f"users_{field}_trgm_idx")
+
+    def test_search_fallback_uses_trigram_indexes(self):
+        UserFactory(last_name="Larikova")
+        users = search_users("Larikovva")
+        for field in TRIGRAM_FIELDS:
+            with self.subTest(field=field):
+                self.assertUsesIndex(users, f"users_{field}_trgm_idx")
+
+    def test_email_lookup_uses_lower_index(self):
+        UserFactory(email="user@neuralia.co")
+        self.assertUsesIndex(User.objects.with_email("User@neuralia.co"), "users_email_lower_uniq")
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersCommandTest(TestCase):
+    rows = [
+        {
+            "email": "anna@NEURALIA.co",
+            "first_name": "Anna",
+            "country": "PL",
+            "birthdate": "1980-02-29",
+            "password": "x",
+        },
+        {"email": "bob@neuralia.co", "first_name": "Bob", "country": "", "password": ""},
+        {"email": "not an email", "first_name": "Carl", "country": "FR"},
+        {"email": "dave@neuralia.co", "first_name": "Dave", "country": "US"},
+        {"email": "anna@neuralia.co", "first_name": "Anna again"},
+        {"email": "taken@neuralia.co", "first_name": "Taken"},
+    ]
+
+    def setUp(self):
+        UserFactory(email="taken@neuralia.co")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.rejects = os.path.join(self.tmpdir.name, "rejects.csv")
+
+    def write_csv(self):
+        path = os.path.join(self.tmpdir.name, "users.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["email", "first_name", "country", "birthdate", "password"])
+            writer.writeheader()
+            writer.writerows(self.rows)
+        return path
+
+    def write_jsonl(self):
+        path = os.path.join(self.tmpdir.name, "users.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(row) + "\n" for row in self.rows)
+        return path
+
+    def import_users(self, path, *args):
+        out = StringIO()
+        call_command("import_users", path, "--batch-size=2", f"--rejects={self.rejects}", *args, stdout=out)
+        return out.getvalue()
+
+    def assertImported(self, out, first_line=2):
+        self.assertIn("2 imported, 4 rejected", out.splitlines()[-1])
+        anna = User.objects.get(email="anna@neuralia.co")
+        self.assertEqual(anna.country, "PL")
+        self.assertEqual(anna.birthdate.isoformat(), "1980-02-29")
+        self.assertTrue(anna.check_password("x"))
+        bob = User.objects.get(email="bob@neuralia.co")
+        self.assertEqual(bob.country, "FR")
+        self.assertFalse(bob.has_usable_password())
+        self.assertNotEqual(anna.username, bob.username)
+
+        with open(self.rejects, newline="", encoding="utf-8") as f:
+            rejects = list(csv.DictReader(f))
+        rejects.sort(key=lambda r: int(r["line"]))
+        self.assertEqual([int(r["line"]) - first_line for r in rejects], [2, 3, 4, 5])
+        self.assertIn("country", rejects[1]["errors"])
+        self.assertEqual(rejects[2]["errors"], "That email is already taken")
+
+    def test_import_csv(self):
+        self.assertImported(self.import_users(self.write_csv(), "--workers=0"))
+
+    def test_import_jsonl_with_process_pool(self):
+        self.assertImported(self.import_users(self.write_jsonl(), "--workers=2"), first_line=1)
+
+    def test_import_with_copy(self):
+        self.assertImported(self.import_users(self.write_csv(), "--workers=0", "--copy"))
+
+    def test_malformed_jsonl_lines_are_rejected(self):
+        path = os.path.join(self.tmpdir.name, "users.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"email": "anna@neuralia.co"}\n{"email": \n["bob@neuralia.co"]\n{"email": "carl@neuralia.co"}\n')
+        out = self.import_users(path, "--workers=0")
+        self.assertIn("2 imported, 2 rejected", out.splitlines()[-1])
+        with open(self.rejects, newline="", encoding="utf-8") as f:
+            rejects = list(csv.DictReader(f))
+        self.assertEqual([int(r["line"]) for r in rejects], [2, 3])
+        self.assertIn("Invalid JSON", rejects[0]["errors"])
+        self.assertEqual(rejects[1]["errors"], "Not a JSON object")
+
+
+class SeedUsersCommandTest(TestCase):
+    def seed_users(self, *args):
+        call_command("seed_users", "60", "--batch-size=25", *args, stdout=StringIO())
+        return User.objects.order_by("pk")
+
+    def test_seed_users(self):
+        users = self.seed_users("--verified-ratio=0.5", "--host-ratio=1")
+        self.assertEqual(users.count(), 60)
+        self.assertEqual(len({u.username for u in users}), 60)
+        verified = users.filter(email_verified=True)
+        self.assertTrue(0 < verified.count() < 60)
+        self.assertQuerysetEqual(users.filter(user_permissions__codename="host"), verified)
+        user = users.first()
+        self.assertTrue(user.check_password(DEFAULT_PASSWORD))
+        self.assertTrue(user.email.endswith(f".{user.pk}@neuralia.co"))
+        self.assertTrue(BIRTHDATE_RANGE[0] <= user.birthdate <= BIRTHDATE_RANGE[1])
+        self.assertIn(user.country, Country.values)
+        self.assertEqual(User.objects.filter(search_vector__isnull=True).count(), 0)
+
+    def test_same_seed_same_users(self):
+        first = list(self.seed_users("--seed=7").values_list("first_name", "last_name", "country", "birthdate"))
+        User.objects.all().delete()
+        second = list(self.seed_users("--seed=7").values_list("first_name", "last_name", "country", "birthdate"))
+        self.assertEqual(first, second)
+        # seeding again adds new users
+        self.assertEqual(self.seed_users("--seed=7").count(), 120)
+
+
+class SeedUsersDeferIndexesTest(TransactionTestCase):
+    def test_defer_indexes(self):
+        call_command("seed_users", "30", "--batch-size=10", "--defer-indexes", stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        for index in User._meta.indexes:
+            self.assertIn(index.name, indexes)
+
+
+class ExportUsersTest(TestCase):
+    def setUp(self):
+        self.users = [UserWithVerifiedEmailFactory(country="BE"), UserFactory(country="IT")]
+
+    def test_export_csv(self):
+        out, err = StringIO(), StringIO()
+        call_command("export_users", "--chunk-size=1", stdout=out, stderr=err)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual([row["email"] for row in rows], [user.email for user in self.users])
+        self.assertEqual(rows[0]["country"], "BE")
+        self.assertEqual(rows[0]["email_verified"], "True")
+        self.assertIn("date_joined", rows[0])
+        self.assertRegex(err.getvalue(), r"^2 rows in .* rows/s\)")
+
+    def test_export_jsonl_fields(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "users.jsonl")
+            call_command(
+                "export_users", "--format=jsonl", "--fields=email,country", f"--output={path}", stderr=StringIO()
+            )
+            with open(path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual(rows, [{"email": user.email, "country": user.country} for user in self.users])
+
+    def test_unknown_field(self):
+        with self.assertRaises(CommandError):
+            call_command("export_users", "--fields=email,password")
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser(email="admin@neuralia.co", password=DEFAULT_PASSWORD)
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse("admin:users_user_changelist"),
+            {"action": "export_csv", "_selected_action": [user.pk for user in self.users]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["email"] for row in rows], [user.email for user in self.users])
+
+
+@override_settings(ADMIN_LARGE_TABLE_THRESHOLD=0)
+@mock.patch.object(CustomUserAdmin, "list_per_page", 2)
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@neuralia.co", password=DEFAULT_PASSWORD)
+        for name in ("bob", "carl", "dave", "eve"):
+            UserFactory(email=f"{name}@neuralia.co")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE users_user")
+        self.client.force_login(self.admin)
+        self.url = reverse("admin:users_user_changelist")
+
+    def emails(self, response):
+        return [user.email for user in response.context["cl"].result_list]
+
+    def test_keyset_pagination(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])
+        self.assertEqual(self.emails(response), ["admin@neuralia.co", "bob@neuralia.co"])
+        self.assertContains(response, "~5 users")
+
+        next_url = self.url + response.context["cl"].next_page_url()
+        self.assertIn("after=bob%40neuralia.co", next_url)
+        response = self.client.get(next_url)
+        self.assertEqual(self.emails(response), ["carl@neuralia.co", "dave@neuralia.co"])
+
+        response = self.client.get(self.url + response.context["cl"].next_page_url())
+        self.assertEqual(self.emails(response), ["eve@neuralia.co"])
+        self.assertIsNone(response.context["cl"].next_after)
+        self.assertContains(response, "First page")
+        self.assertNotContains(response, "Next page")
+
+    def test_search(self):
+        response = self.client.get(self.url, {"q": "dave"})
+        self.assertEqual(self.emails(response), ["dave@neuralia.co"])
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_sorted_column_uses_numbered_pages(self):
+        response = self.client.get(self.url, {"o": "-1"})
+        self.assertFalse(response.context["cl"].keyset)
+        self.assertEqual(self.emails(response), ["eve@neuralia.co", "dave@neuralia.co"])
+        self.assertEqual(response.context["cl"].result_count, 5)
+
+    @override_settings(ADMIN_LARGE_TABLE_THRESHOLD=100)
+    def test_small_table(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.context["cl"].keyset)
+        self.assertEqual(response.context["cl"].result_count, 5)
+
+
+class SessionStoreTest(TestCase):
+    def setUp(self):
+        self.session = SessionStore()
+        self.session["answer"] = 42
+        self.session.save()
+
+    def test_unchanged_session_is_not_saved(self):
+        session = SessionStore(self.session.session_key)
+        self.assertEqual(session["answer"], 42)
+        with self.assertNumQueries(0):
+            session.save()
+
+    def test_database_write_is_deferred(self):
+        session = SessionStore(self.session.session_key)
+        session["answer"] = 43
+        with self.assertNumQueries(0):
+            session.save()
+        self.assertEqual(SessionStore(self.session.session_key)["answer"], 43)
+        self.assertEqual(Session.objects.get().get_decoded(), {"answer": 42})
+
+        with override_settings(SESSION_DB_WRITE_INTERVAL=0):
+            session = SessionStore(self.session.session_key)
+            session["answer"] = 44
+            session.save()
+        self.assertEqual(Session.objects.get().get_decoded(), {"answer": 44})
+
+    def test_authentication_is_written_through(self):
+        user = UserFactory()
+        session = SessionStore(self.session.session_key)
+        session["_auth_user_id"] = str(user.pk)
+        session.save()
+        self.assertEqual(Session.objects.get().get_decoded()["_auth_user_id"], str(user.pk))
+
+    def test_cache_miss_falls_back_to_database(self):
+        session = SessionStore(self.session.session_key)
+        session._cache.delete(session.cache_key)
+        self.assertEqual(session["answer"], 42)
+
+
+class SweepSessionsCommandTest(TestCase):
+    def test_sweep(self):
+        past, future = timezone.now() - timezone.timedelta(days=1), timezone.now() + timezone.timedelta(days=1)
+        Session.objects.bulk_create(
+            [Session(session_key=f"expired{i}", session_data="", expire_date=past) for i in range(5)]
+            + [Session(session_key="alive", session_data="", expire_date=future)]
+        )
+        out = StringIO()
+        with self.assertNumQueries(7):  # 3 batches of select + delete, and a last empty select
+            call_command("sweep_sessions", "--batch-size=2", stdout=out)
+        self.assertEqual(out.getvalue(), "5 expired sessions deleted\n")
+        self.assertQuerysetEqual(Session.objects.values_list("session_key", flat=True), ["alive"])
+
+
+class CachedUserTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+
+    def test_authenticated_requests_skip_the_database(self):
+        self.client.get(reverse("users:update"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("users:update"))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_user_save(self):
+        self.client.get(reverse("users:update"))
+        self.user.first_name = "Anton"
+        self.user.save()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("users:update"))
+        self.assertEqual(response.wsgi_request.user.first_name, "Anton")
+
+    def test_password_change(self):
+        other_session = Client()
+        other_session.force_login(self.user)
+        other_session.get(reverse("users:update"))
+
+        data = {"old_password": DEFAULT_PASSWORD, "new_password1": "n3w-Passw0rd", "new_password2": "n3w-Passw0rd"}
+        self.client.post(reverse("users:password"), data)
+        response = self.client.get(reverse("users:update"))
+        self.assertTrue(response.wsgi_request.user.check_password("n3w-Passw0rd"))
+
+        response = other_session.get(reverse("users:update"))
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_password_change_in_another_process(self):
+        self.client.get(reverse("users:update"))
+        # without User.save() signals, as the invalidation of another worker's local memory cache
+        User.objects.filter(pk=self.user.pk).update(password=make_password("n3w-Passw0rd"))
+        self.assertEqual(self.client.get(reverse("users:update")).status_code, 200)
+
+        with override_settings(AUTH_CACHE_ALIAS=None):
+            self.assertEqual(self.client.get(reverse("users:update")).status_code, 302)
+
+    @override_settings(AUTH_CACHE_ALIAS=None)
+    def test_without_shared_cache(self):
+        self.client.get(reverse("users:update"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("users:update"))
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_logout(self):
+        self.client.get(reverse("users:update"))
+        session_key = self.client.session.session_key
+        self.assertIsNotNone(auth_cache().get(SESSION_USER_KEY.format(session_key)))
+
+        self.client.get(reverse("users:logout"))
+        self.assertIsNone(auth_cache().get(SESSION_USER_KEY.format(session_key)))
+
+    def test_admin_permission_changes(self):
+        admin_session = Client()
+        admin_session.force_login(User.objects.create_superuser(email="admin@neuralia.co", password=DEFAULT_PASSWORD))
+        changelist = reverse("admin:users_user_changelist")
+
+        def change_user(**data):
+            data = {
+                "email": self.user.email,
+                "first_name": self.user.first_name,
+                "last_name": self.user.last_name,
+                "country": self.user.country,
+                "is_active": "on",
+                "date_joined_0": "2022-01-01",
+                "date_joined_1": "00:00:00",
+                **data,
+            }
+            response = admin_session.post(reverse("admin:users_user_change", args=[self.user.pk]), data)
+            self.assertRedirects(response, changelist)
+
+        self.assertEqual(self.client.get(changelist).status_code, 302)
+
+        view_user = Permission.objects.get(codename="view_user")
+        change_user(is_staff="on", user_permissions=[view_user.pk])
+        self.assertEqual(self.client.get(changelist).status_code, 200)
+
+        change_user(is_staff="on", user_permissions=[])
+        self.assertEqual(self.client.get(changelist).status_code, 403)
+
+        change_user()
+        self.assertEqual(self.client.get(changelist).status_code, 302)
+
+
+class PermissionCacheTest(TestCase):
+    def setUp(self):
+        permission_cache().clear()
+        self.host = Permission.objects.get(codename="host")
+        self.user = UserFactory()
+        self.client.force_login(self.user)
+        self.url = reverse("users:host")
+
+    def assertHost(self, allowed):
+        self.assertEqual(self.client.get(self.url).status_code, 200 if allowed else 403)
+
+    def test_host_dashboard_skips_the_permission_tables(self):
+        self.user.user_permissions.add(self.host)
+        self.assertHost(True)
+        with self.assertNumQueries(0):
+            self.assertHost(True)
+        self.assertEqual(permission_cache_stats(), {"hits": 1, "misses": 1})
+
+    def test_homepage(self):
+        self.client.get(reverse("home:homepage"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("home:homepage"))
+
+    def test_user_permissions(self):
+        self.assertHost(False)
+        self.host.user_set.add(self.user)
+        self.assertHost(True)
+        self.user.user_permissions.remove(self.host)
+        self.assertHost(False)
+        self.user.user_permissions.add(self.host)
+        self.assertHost(True)
+        self.host.user_set.clear()
+        self.assertHost(False)
+
+    def test_groups(self):
+        group = Group.objects.create(name="hosts")
+        group.permissions.add(self.host)
+        self.assertHost(False)
+        self.user.groups.add(group)
+        self.assertHost(True)
+        group.permissions.remove(self.host)
+        self.assertHost(False)
+        self.host.group_set.add(group)
+        self.assertHost(True)
+        self.host.group_set.clear()
+        self.assertHost(False)
+        group.permissions.add(self.host)
+        self.assertHost(True)
+        group.user_set.remove(self.user)
+        self.assertHost(False)
+
+    def test_group_deletion(self):
+        group = Group.objects.create(name="hosts")
+        group.permissions.add(self.host)
+        group.user_set.add(self.user)
+        self.assertHost(True)
+        group.delete()
+        self.assertHost(False)
+
+    def test_revoked_in_another_process(self):
+        self.user.user_permissions.add(self.host)
+        self.assertHost(True)
+        # without m2m_changed signals, as the invalidation of another worker's local memory cache
+        User.user_permissions.through.objects.filter(user=self.user).delete()
+        self.assertHost(True)
+
+        with override_settings(PERMISSION_CACHE_ALIAS=None):
+            self.assertHost(False)
+            self.user.user_permissions.add(self.host)
+            self.assertHost(True)
+
+
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def login(self, password=DEFAULT_PASSWORD):
+        return self.client.post(reverse("users:login"), {"email": self.user.email, "password": password})
+
+    def test_hash_in_request_thread(self):
+        hashing.set_password(self.user, "secret")
+        self.assertTrue(self.user.check_password("secret"))
+        self.assertTrue(hashing.check_password(self.user, "secret"))
+        self.assertFalse(hashing.check_password(self.user, "wrong"))
+        self.assertFalse(hashing.check_password(self.user, None))
+        self.assertFalse(is_password_usable(hashing.make_password(None)))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_hash_in_pool(self):
+        password = hashing.make_password("secret")
+        self.assertEqual(hashing.get_pool()[0]._max_workers, 1)  # pylint: disable=protected-access
+        self.assertTrue(check_password("secret", password))
+        self.user.password = password
+        self.assertTrue(hashing.check_password(self.user, "secret"))
+        self.assertTrue(async_to_sync(hashing.acheck_password)(self.user, "secret"))
+        self.assertFalse(async_to_sync(hashing.acheck_password)(self.user, "wrong"))
+        self.assertTrue(check_password("other", async_to_sync(hashing.amake_password)("other")))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=1)
+    def test_busy_pool(self):
+        hashing.make_password("warm up the worker")
+        hashing.submit(time.sleep, 1)
+        with self.assertRaises(hashing.PasswordHashingBusy):
+            hashing.make_password("secret")
+        response = self.login()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.ScryptPasswordHasher",
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+        ]
+    )
+    def test_rehash_on_login(self):
+        self.user.password = get_hasher("md5").encode(DEFAULT_PASSWORD, "salt")
+        self.user.save()
+        self.assertEqual(self.login("wrong").status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("md5$"))
+
+        self.assertRedirects(self.login(), reverse("home:homepage"))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("scrypt$"))
+        self.assertTrue(self.user.check_password(DEFAULT_PASSWORD))
+
+    def test_update_password(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("users:password"),
+            {"old_password": DEFAULT_PASSWORD, "new_password1": "n3w-Passw0rd!", "new_password2": "n3w-Passw0rd!"},
+        )
+        self.assertRedirects(response, self.user.get_absolute_url())
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("n3w-Passw0rd!"))
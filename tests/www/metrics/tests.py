@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.users.factories import UserFactory
+from apps.www import metrics, throttling
+
+
+@override_settings(METRICS_TOKEN="scraper-token")
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.samples.clear()
+        throttling.decisions.clear()
+        self.user = UserFactory()
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer scraper-token")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        return response.content.decode()
+
+    def value(self, text, sample):
+        match = re.search(rf"^{re.escape(sample)} (\S+)$", text, re.MULTILINE)
+        self.assertIsNotNone(match, sample)
+        return float(match.group(1))
+
+    def test_request_metrics(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("home:homepage"))
+        self.client.get(reverse("home:homepage"))
+        self.client.get(self.user.get_absolute_url())
+        text = self.scrape()
+
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        self.assertEqual(self.value(text, 'http_requests_total{status="200",view="home:homepage"}'), 2)
+        self.assertEqual(self.value(text, 'http_request_duration_seconds_count{view="home:homepage"}'), 2)
+        self.assertEqual(self.value(text, 'http_request_duration_seconds_bucket{view="home:homepage",le="+Inf"}'), 2)
+        buckets = re.findall(r'^http_request_duration_seconds_bucket\{view="home:homepage",le="([^"]+)"\}', text, re.M)
+        self.assertEqual(buckets, [str(bucket) for bucket in metrics.LATENCY_BUCKETS] + ["+Inf"])
+        self.assertGreater(self.value(text, 'template_render_duration_seconds_total{view="home:homepage"}'), 0)
+
+        self.assertGreater(self.value(text, 'db_queries_total{view="users:profile"}'), 0)
+        self.assertGreater(self.value(text, 'db_query_duration_seconds_total{view="users:profile"}'), 0)
+        self.assertEqual(
+            self.value(text, 'cache_lookups_total{cache="profile",result="miss",view="users:profile"}'), 1
+        )
+        self.assertEqual(self.value(text, 'cache_lookups_total{cache="auth",result="hit",view="home:homepage"}'), 1)
+
+    @override_settings(THROTTLE_RATES={"login": {"ip": "1/m"}})
+    def test_throttle_decisions(self):
+        throttling.local_counts.clear()
+        for _ in range(2):
+            self.client.post(reverse("users:login"), {"email": self.user.email, "password": "wrongpassword"})
+        text = self.scrape()
+        self.assertEqual(self.value(text, 'throttle_decisions_total{decision="allowed",scope="login"}'), 1)
+        self.assertEqual(self.value(text, 'throttle_decisions_total{decision="rejected",scope="login"}'), 1)
+        self.assertEqual(self.value(text, 'http_requests_total{status="429",view="users:login"}'), 1)
+
+    def test_scrapers_only(self):
+        # behind a proxy on the same host, every client comes from 127.0.0.1
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer guess")
+        self.assertEqual(response.status_code, 404)
+        with self.settings(METRICS_TOKEN=""):
+            self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer ").status_code, 404)
+        with self.settings(METRICS_ALLOWED_IPS=["10.0.0.5"]):
+            self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.5").status_code, 200)
+
+    def test_processes_share_a_directory(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            other_process = [["http_requests_total", [["status", "200"], ["view", "home:homepage"]], 2]]
+            with open(os.path.join(directory, "metrics-1.json"), "w", encoding="utf-8") as f:
+                json.dump(other_process, f)
+            self.client.get(reverse("home:homepage"))
+            text = self.scrape()
+            self.assertTrue(os.path.exists(os.path.join(directory, f"metrics-{os.getpid()}.json")))
+        self.assertEqual(self.value(text, 'http_requests_total{status="200",view="home:homepage"}'), 3)
+
+    def test_dead_processes_are_archived(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            for pid in (1, 2):
+                dead_process = [["http_requests_total", [["status", "200"], ["view", "home:homepage"]], pid]]
+                with open(os.path.join(directory, f"metrics-{pid}.json"), "w", encoding="utf-8") as f:
+                    json.dump(dead_process, f)
+                metrics.mark_process_dead(pid)
+            metrics.mark_process_dead(3)
+            self.assertEqual(os.listdir(directory), [metrics.ARCHIVE_FILENAME])
+            self.client.get(reverse("home:homepage"))
+            text = self.scrape()
+
+            metrics.clear_processes()
+            self.assertEqual(os.listdir(directory), [])
+        self.assertEqual(self.value(text, 'http_requests_total{status="200",view="home:homepage"}'), 4)
@@ -0,0 +1,101 @@
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from apps.users.factories import DEFAULT_PASSWORD, UserFactory
+from apps.www.pagecache import page_cache, page_key
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=600)
+class PageCacheTest(TestCase):
+    urls = ("home:homepage", "users:login", "users:signup")
+
+    def setUp(self):
+        page_cache().clear()
+
+    def test_anonymous_pages_are_cached(self):
+        for name in self.urls:
+            with self.subTest(name=name):
+                miss = self.client.get(reverse(name))
+                self.assertIn("core/base.html", [t.name for t in miss.templates])
+                self.assertContains(miss, reverse("users:signup"))
+                self.assertNotContains(miss, "fragment:")
+
+                hit = self.client.get(reverse(name))
+                # only the nav fragment is rendered again
+                self.assertEqual([t.name for t in hit.templates], ["partials/nav.html"])
+                self.assertContains(hit, reverse("users:signup"))
+                self.assertNotContains(hit, "fragment:")
+
+    async def test_asgi(self):
+        await self.async_client.get(reverse("home:homepage"))
+        response = await self.async_client.get(reverse("home:homepage"))
+        self.assertEqual([t.name for t in response.templates], ["partials/nav.html"])
+        self.assertContains(response, reverse("users:login"))
+
+    def test_csrf_token_per_visitor(self):
+        self.client.get(reverse("users:login"))
+        user, tokens = UserFactory(), set()
+        for _ in range(2):
+            client = Client(enforce_csrf_checks=True)
+            response = client.get(reverse("users:login"))
+            self.assertEqual([t.name for t in response.templates], ["partials/nav.html"])
+            self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+            token = re.search(r'name="csrfmiddlewaretoken" value="(\w+)"', response.content.decode())[1]
+            tokens.add(token)
+
+            response = client.post(
+                reverse("users:login"),
+                {"email": user.email, "password": DEFAULT_PASSWORD, "csrfmiddlewaretoken": token},
+            )
+            self.assertRedirects(response, reverse("home:homepage"), fetch_redirect_response=False)
+        self.assertEqual(len(tokens), 2)
+
+    def test_logged_in_users_skip_the_cache(self):
+        self.client.get(reverse("home:homepage"))
+        user = UserFactory()
+        self.client.force_login(user)
+        response = self.client.get(reverse("home:homepage"))
+        self.assertContains(response, f"Bienvenue {user.email}")
+        self.assertContains(response, user.get_absolute_url())
+
+    def test_pending_messages_skip_the_cache(self):
+        self.client.get(reverse("home:homepage"))
+        self.client.force_login(UserFactory())
+        response = self.client.get(reverse("users:logout"), follow=True)
+        self.assertContains(response, "See you later")
+
+    def test_keys_vary_on_language_and_release(self):
+        request = self.client.get(reverse("home:homepage")).wsgi_request
+        key = page_key(request)
+        with translation.override("en"):
+            self.assertNotEqual(page_key(request), key)
+        with override_settings(RELEASE="next"):
+            self.assertNotEqual(page_key(request), key)
+            response = self.client.get(reverse("home:homepage"))
+        self.assertIn("core/base.html", [t.name for t in response.templates])
+
+    def test_keys_ignore_other_query_params(self):
+        self.client.get(reverse("users:login"))
+        response = self.client.get(reverse("users:login"), {"utm_source": "mail", "page": "2"})
+        self.assertEqual([t.name for t in response.templates], ["partials/nav.html"])
+
+        response = self.client.get(reverse("users:login"), {"next": reverse("users:search"), "utm_source": "mail"})
+        self.assertIn("core/base.html", [t.name for t in response.templates])
+        response = self.client.get(reverse("users:login"), {"utm_source": "ad", "next": reverse("users:search")})
+        self.assertEqual([t.name for t in response.templates], ["partials/nav.html"])
+
+    def test_own_cache_alias(self):
+        request = self.client.get(reverse("home:homepage")).wsgi_request
+        self.assertIsNotNone(page_cache().get(page_key(request)))
+        self.assertIsNone(caches["default"].get(page_key(request)))
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.client.get(reverse("home:homepage"))
+        response = self.client.get(reverse("home:homepage"))
+        self.assertIn("core/base.html", [t.name for t in response.templates])
@@ -0,0 +1,104 @@
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.users.cache import get_profile
+from apps.users.factories import UserFactory
+from apps.users.models import User
+from apps.www.replicas import PIN_COOKIE
+
+
+@override_settings(REPLICA_DATABASE="replica")
+class ReplicaRoutingTest(TransactionTestCase):
+    """The replica alias is a second connection to the test database, committed rows are visible on both."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        self.admin = User.objects.create_superuser(email="admin@neuralia.co", password="password")
+
+    def replica_queries(self, url, method="get", data=None):
+        with CaptureQueriesContext(connections["replica"]) as ctx:
+            response = getattr(self.client, method)(url, data)
+        return response, len(ctx.captured_queries)
+
+    def test_search(self):
+        self.client.force_login(self.user)
+        response, queries = self.replica_queries(reverse("users:search"), data={"q": self.user.last_name})
+        self.assertContains(response, self.user.get_absolute_url())
+        self.assertGreater(queries, 0)
+
+    def test_admin_changelist(self):
+        self.client.force_login(self.admin)
+        response, queries = self.replica_queries(reverse("admin:users_user_changelist"))
+        self.assertContains(response, self.user.email)
+        self.assertGreater(queries, 0)
+
+    def test_other_views_use_the_primary(self):
+        self.client.force_login(self.user)
+        # the profile page reads the profile it caches, see test_lagging_replica_is_not_cached
+        for url in [reverse("home:homepage"), reverse("users:update"), self.user.get_absolute_url()]:
+            response, queries = self.replica_queries(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(queries, 0, url)
+
+    def test_read_your_writes(self):
+        self.client.force_login(self.user)
+        data = {"first_name": "Anton", "last_name": "Larikova", "country": "FR", "bio": "", "birthdate": ""}
+        response, queries = self.replica_queries(reverse("users:update"), "post", data)
+        self.assertEqual(queries, 0)
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 10)
+
+        search = reverse("users:search")
+        response, queries = self.replica_queries(search, data={"q": "Larikova"})
+        self.assertContains(response, self.user.get_absolute_url())
+        self.assertEqual(queries, 0)
+
+        self.client.cookies.pop(PIN_COOKIE)
+        response, queries = self.replica_queries(search, data={"q": "Larikova"})
+        self.assertGreater(queries, 0)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def lag_replica(self):
+        """Freeze what the replica sees at the current state of the primary, as a replica lagging behind would."""
+        replica = connections["replica"]
+        with replica.cursor() as cursor:
+            cursor.execute("BEGIN ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("SELECT 1 FROM users_user")
+        self.addCleanup(lambda: replica.cursor().execute("ROLLBACK"))
+
+    def test_lagging_replica_is_not_cached(self):
+        self.client.force_login(self.user)
+        self.user.is_staff = True
+        self.user.save()
+        self.lag_replica()
+
+        # saved after the replica's snapshot, which invalidates the cached user, profile and permissions
+        self.user.first_name = "Fresh"
+        self.user.save()
+        self.user.user_permissions.add(Permission.objects.get(codename="view_user"))
+        with connections["replica"].cursor() as cursor:
+            cursor.execute("SELECT first_name FROM users_user WHERE id = %s", [self.user.pk])
+            self.assertNotEqual(cursor.fetchone()[0], "Fresh")
+
+        # a replica-routed page filling the auth and permission caches
+        response, queries = self.replica_queries(reverse("admin:users_user_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.wsgi_request.user.first_name, "Fresh")
+
+        response = self.client.get(self.user.get_absolute_url())
+        self.assertContains(response, "Fresh")
+        self.assertEqual(get_profile(self.user.username)["user"].first_name, "Fresh")
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_without_replica(self):
+        self.client.force_login(self.user)
+        response, queries = self.replica_queries(self.user.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, 0)
@@ -0,0 +1,34 @@
+"""
+Render time of the form fields with render_fields, against the include chain it replaced in mixins/generic_form.html.
+
+    python manage.py test tests.www.templatetags -p "bench_*.py"
+
+Each form of the form pages is rendered BENCHMARK_RUNS times both ways, and the best of BENCHMARK_REPEATS is kept.
+"""
+
+import os
+import timeit
+
+from django.template import engines
+from django.test import TestCase
+
+from tests.www.templatetags.tests import INCLUDE_CHAIN, RENDER_FIELDS, forms_to_render
+
+RUNS = int(os.getenv("BENCHMARK_RUNS", "500"))
+REPEATS = int(os.getenv("BENCHMARK_REPEATS", "5"))
+
+
+class RenderFieldsBenchmark(TestCase):
+    def test_render_fields(self):
+        engine = engines.all()[0]
+        include_chain, render_fields = engine.from_string(INCLUDE_CHAIN), engine.from_string(RENDER_FIELDS)
+        for form in forms_to_render():
+            context = {"form": form}
+            before, after = (
+                min(timeit.repeat(lambda t=template: t.render(context), number=RUNS, repeat=REPEATS)) / RUNS
+                for template in (include_chain, render_fields)
+            )
+            print(
+                f"\n{type(form).__name__} ({len(form.fields)} fields): include chain {before * 1e6:.0f}us, "
+                f"render_fields {after * 1e6:.0f}us ({before / after:.2f}x)"
+            )
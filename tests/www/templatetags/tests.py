@@ -1,6 +1,20 @@
+from datetime import date
+from unittest import mock
+
 from django import forms
-from django.template import Context, Template
+from django.template import Context, Template, engines
 from django.test import TestCase
+from django.urls import reverse
+
+from apps.users.factories import UserFactory
+from apps.www.templatetags import form_fields
+from apps.www.users.forms import (
+    LoginForm,
+    PasswordResetForm,
+    SignUpForm,
+    UpdatePasswordForm,
+    UpdateProfileForm,
+)
 
 
 class UtilsTemplateTagTests(TestCase):
@@ -54,3 +68,86 @@ class UtilsTemplateTagTests(TestCase):
             )
         )
         self.assertEqual(out.strip(), "True,False,")
+
+
+# the field loop of mixins/generic_form.html before render_fields, without the whitespace between its tags
+INCLUDE_CHAIN = (
+    "{% load form_fields %}"
+    "{% for field in form %}"
+    "{% if field|is_select %}{% include 'mixins/formfield_select.html' with field=field %}"
+    "{% elif field|is_dateinput%}{% include 'mixins/formfield_datepicker.html' with field=field %}"
+    "{% elif field|is_textarea%}{% include 'mixins/formfield_textarea.html' with field=field %}"
+    "{% else %}{% include 'mixins/formfield_input.html' with field=field %}"
+    "{% endif %}"
+    "{% endfor %}"
+)
+RENDER_FIELDS = "{% load form_fields %}{% render_fields form %}"
+
+
+def forms_to_render():
+    user = UserFactory(bio="Bio <b>", birthdate=date(1980, 2, 29))
+    return [
+        LoginForm(),
+        LoginForm(data={"email": "not an email"}),
+        SignUpForm(data={"email": user.email}),
+        UpdateProfileForm(instance=user),
+        UpdateProfileForm(instance=user, data={"country": "??"}),
+        UpdatePasswordForm(user),
+        PasswordResetForm(),
+    ]
+
+
+class RenderFieldsTest(TestCase):
+    def setUp(self):
+        form_fields.field_template_names.clear()
+
+    def test_same_markup_as_include_chain(self):
+        include_chain = engines.all()[0].from_string(INCLUDE_CHAIN)
+        render_fields = engines.all()[0].from_string(RENDER_FIELDS)
+        for form in forms_to_render():
+            with self.subTest(form=type(form).__name__):
+                context = {"form": form, "cta": "Go"}
+                self.assertEqual(render_fields.render(context), include_chain.render(context))
+
+    def test_generic_form(self):
+        self.client.force_login(UserFactory())
+        response = self.client.get(reverse("users:update"))
+        self.assertContains(response, 'name="bio"')
+        self.assertContains(response, 'name="birthdate"')
+        self.assertTrue(
+            {
+                "mixins/formfield_input.html",
+                "mixins/formfield_select.html",
+                "mixins/formfield_datepicker.html",
+                "mixins/formfield_textarea.html",
+            }
+            <= {t.name for t in response.templates}
+        )
+
+    def test_templates_resolved_once_per_widget_class(self):
+        template = engines.all()[0].from_string(RENDER_FIELDS)
+        (is_select, select_template), *others = form_fields.FIELD_TEMPLATES
+        with mock.patch.object(
+            form_fields, "FIELD_TEMPLATES", ((mock.Mock(wraps=is_select), select_template), *others)
+        ) as field_templates:
+            for _ in range(3):
+                template.render({"form": UpdateProfileForm()})
+        # every widget class goes through the first test once
+        self.assertEqual(field_templates[0][0].call_count, 4)
+        self.assertEqual(
+            form_fields.field_template_names,
+            {
+                forms.TextInput: "mixins/formfield_input.html",
+                forms.Select: "mixins/formfield_select.html",
+                forms.DateInput: "mixins/formfield_datepicker.html",
+                forms.Textarea: "mixins/formfield_textarea.html",
+            },
+        )
+
+    def test_fields_changed_per_instance(self):
+        template = engines.all()[0].from_string(RENDER_FIELDS)
+        template.render({"form": UpdateProfileForm()})
+        form = UpdateProfileForm()
+        form.fields["bio"].widget = forms.TextInput()
+        self.assertNotIn("<textarea", template.render({"form": form}))
+        self.assertIn("<textarea", template.render({"form": UpdateProfileForm()}))
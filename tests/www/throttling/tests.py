@@ -0,0 +1,141 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from apps.users.factories import DEFAULT_PASSWORD, UserFactory
+from apps.users.hashing import acheck_password
+from apps.www import throttling
+
+
+class InterleavingCache:
+    """Cache proxy holding each thread after its first call until every thread has made its own."""
+
+    def __init__(self, cache, threads=2):
+        self.cache = cache
+        self.barrier = threading.Barrier(threads)
+        self.called = threading.local()
+
+    def __getattr__(self, name):
+        method = getattr(self.cache, name)
+
+        def call(*args, **kwargs):
+            result = method(*args, **kwargs)
+            if not getattr(self.called, "once", False):
+                self.called.once = True
+                self.barrier.wait(timeout=5)
+            return result
+
+        return call
+
+
+@override_settings(
+    THROTTLE_RATES={
+        "login": {"ip": "5/m", "email": "2/m"},
+        "signup": {"ip": "1/h"},
+        "password_reset": {"ip": "10/h", "email": "1/h"},
+    }
+)
+class ThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        throttling.local_counts.clear()
+        throttling.decisions.clear()
+        self.user = UserFactory()
+
+    def login(self, email, ip="127.0.0.1"):
+        return self.client.post(reverse("users:login"), {"email": email, "password": "wrongpassword"}, REMOTE_ADDR=ip)
+
+    @mock.patch("time.time", return_value=1000)
+    def test_login_throttled_by_email(self, time):
+        # the login view is async, it checks passwords with acheck_password() in the hashing pool
+        with mock.patch("apps.www.users.forms.acheck_password", wraps=acheck_password) as check_password:
+            self.assertEqual(self.login(self.user.email).status_code, 200)
+            self.assertEqual(self.login(self.user.email.upper()).status_code, 200)
+            self.assertEqual(check_password.await_count, 2)
+            response = self.login(self.user.email)
+        self.assertEqual(response.status_code, 429)
+        # the minute window started at 960
+        self.assertEqual(response["Retry-After"], "20")
+        self.assertEqual(check_password.await_count, 2)
+        self.assertEqual(throttling.decisions[("login", "allowed")], 2)
+        self.assertEqual(throttling.decisions[("login", "rejected")], 1)
+
+        # other accounts are still reachable from the same IP
+        self.assertEqual(self.login("other@neuralia.co").status_code, 200)
+
+    def test_login_throttled_by_ip(self):
+        for i in range(5):
+            self.assertEqual(self.login(f"user{i}@neuralia.co").status_code, 200)
+        self.assertEqual(self.login("user5@neuralia.co").status_code, 429)
+        self.assertEqual(self.login("user5@neuralia.co", ip="10.0.0.1").status_code, 200)
+
+    @override_settings(THROTTLE_TRUSTED_PROXIES=1)
+    def test_login_throttled_by_ip_behind_proxy(self):
+        def login(email, forwarded_for):
+            return self.client.post(
+                reverse("users:login"),
+                {"email": email, "password": "wrongpassword"},
+                REMOTE_ADDR="127.0.0.1",
+                HTTP_X_FORWARDED_FOR=forwarded_for,
+            )
+
+        # the client sets the first entries, the proxy appends the address it received the request from
+        for i in range(5):
+            self.assertEqual(login(f"user{i}@neuralia.co", f"10.0.0.{i}, 203.0.113.7").status_code, 200)
+        self.assertEqual(login("user5@neuralia.co", "203.0.113.7").status_code, 429)
+        self.assertEqual(login("user5@neuralia.co", "203.0.113.8").status_code, 200)
+        self.assertEqual(self.login("user5@neuralia.co").status_code, 200)
+
+    def test_client_ip(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2, 3.3.3.3")
+        for proxies, ip in ((0, "127.0.0.1"), (1, "3.3.3.3"), (2, "2.2.2.2"), (5, "1.1.1.1")):
+            with self.subTest(proxies=proxies), override_settings(THROTTLE_TRUSTED_PROXIES=proxies):
+                self.assertEqual(throttling.client_ip(request), ip)
+
+    def test_get_is_not_throttled(self):
+        for _ in range(3):
+            self.login(self.user.email)
+        self.assertEqual(self.client.get(reverse("users:login")).status_code, 200)
+
+    def test_next_window(self):
+        with mock.patch("time.time", return_value=1000):
+            self.login(self.user.email)
+            self.login(self.user.email)
+            self.assertEqual(self.login(self.user.email).status_code, 429)
+        with mock.patch("time.time", return_value=1020):
+            self.assertEqual(self.login(self.user.email).status_code, 200)
+            self.assertEqual(self.login(self.user.email).status_code, 200)
+            self.assertEqual(self.login(self.user.email).status_code, 429)
+
+    def test_concurrent_consumers(self):
+        # two workers racing on the same empty window, each stopped after its first cache call until the other
+        # has made its own: a read-then-write of the count would let both through
+        cache_proxy = InterleavingCache(cache)
+        with mock.patch.object(throttling, "caches", {settings.THROTTLE_CACHE_ALIAS: cache_proxy}):
+            with ThreadPoolExecutor(2) as executor:
+                waits = list(
+                    executor.map(lambda _: throttling.consume("login", "email", "a@neuralia.co", "1/m"), "ab")
+                )
+        self.assertEqual(sorted(wait > 0 for wait in waits), [False, True])
+
+    def test_shared_between_processes(self):
+        self.login(self.user.email)
+        self.login(self.user.email)
+        # another worker process has its own local buckets but the same cache
+        throttling.local_counts.clear()
+        self.assertEqual(self.login(self.user.email).status_code, 429)
+
+    def test_signup(self):
+        data = {"email": "new@neuralia.co", "password": DEFAULT_PASSWORD, "first_name": "New", "last_name": "User"}
+        self.assertEqual(self.client.post(reverse("users:signup"), data).status_code, 302)
+        self.assertEqual(self.client.post(reverse("users:signup"), data).status_code, 429)
+
+    def test_password_reset(self):
+        url = reverse("users:password_reset")
+        self.assertEqual(self.client.post(url, {"email": self.user.email}).status_code, 302)
+        self.assertEqual(self.client.post(url, {"email": self.user.email}).status_code, 429)
@@ -2,6 +2,7 @@ from django.forms import widgets
 from django.test import TestCase
 
 from apps.users.factories import DEFAULT_PASSWORD, UserFactory
+from apps.users.models import User
 from apps.www.users.forms import LoginForm, SignUpForm, UpdateProfileForm
 
 
@@ -24,6 +25,7 @@ class LoginFormTest(TestCase):
         form = LoginForm(data=form_data)
         self.assertFalse(form.is_valid())
         self.assertEqual(form.errors["password"], ["Password is wrong"])
+        self.assertIsNone(form.get_user())
 
     def test_unknown_user(self):
         form_data = {
@@ -41,6 +43,12 @@ class LoginFormTest(TestCase):
         }
         form = LoginForm(data=form_data)
         self.assertTrue(form.is_valid())
+        self.assertEqual(form.get_user(), self.user)
+
+    def test_login_email_case(self):
+        form = LoginForm(data={"email": self.user.email.upper(), "password": DEFAULT_PASSWORD})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.get_user(), self.user)
 
 
 class SignUpFormTest(TestCase):
@@ -61,8 +69,17 @@ class SignUpFormTest(TestCase):
             "password1": DEFAULT_PASSWORD,
         }
         form = SignUpForm(data=form_data)
-        self.assertFalse(form.is_valid())
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+        self.assertIsNone(form.save())
+        self.assertIn("That email is already taken", form.errors["email"])
+
+    def test_email_exists_whatever_the_case(self):
+        form = SignUpForm(data={"email": self.user.email.upper(), "password": DEFAULT_PASSWORD})
+        self.assertTrue(form.is_valid())
+        self.assertIsNone(form.save())
         self.assertIn("That email is already taken", form.errors["email"])
+        self.assertEqual(User.objects.with_email(self.user.email).count(), 1)
 
     def test_signup_ok(self):
         form_data = {
@@ -1,13 +1,23 @@
+import asyncio
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+from unittest import mock
 
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.tokens import default_token_generator
 from django.core import mail
-from django.test import TestCase
+from django.db import connection, connections
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_encode
+from django.utils.http import urlencode, urlsafe_base64_encode
 
+from apps.emails.models import Email
+from apps.users.cache import invalidate_profile, profile_cache, profile_cache_stats
 from apps.users.factories import (
     DEFAULT_PASSWORD,
     HostFactory,
@@ -15,6 +25,8 @@ from apps.users.factories import (
     UserWithVerifiedEmailFactory,
 )
 from apps.users.models import User
+from apps.users.tokens import make_email_verification_token
+from apps.www import throttling
 
 
 class LoginViewTest(TestCase):
@@ -48,6 +60,29 @@ class LoginViewTest(TestCase):
         }
         response = self.client.post(self.url, data=form_data)
         self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+        self.assertEqual(int(self.client.session["_auth_user_id"]), self.user.pk)
+
+    def test_login_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        form_data = {
+            "email": self.user.email,
+            "password": DEFAULT_PASSWORD,
+        }
+        response = self.client.post(self.url, data=form_data)
+        self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+    def test_login_hashes_password_once(self):
+        # counted on the hasher of the factories' passwords, whatever name the runner imported this module under
+        hasher = type(get_hasher())
+        for password, expected_status in ((DEFAULT_PASSWORD, 302), ("wrongpassword", 200)):
+            with self.subTest(password=password):
+                with mock.patch.object(hasher, "verify", autospec=True, side_effect=hasher.verify) as verify:
+                    response = self.client.post(self.url, data={"email": self.user.email, "password": password})
+                self.assertEqual(response.status_code, expected_status)
+                self.assertEqual(verify.call_count, 1)
 
 
 class SignUpViewTest(TestCase):
@@ -94,6 +129,43 @@ class SignUpViewTest(TestCase):
             email.subject,
         )
 
+    @override_settings(EMAIL_QUEUE_SYNC=False)
+    def test_signup_queues_verification_email(self):
+        form_data = {
+            "email": self.email,
+            "password": DEFAULT_PASSWORD,
+            "first_name": "John",
+            "last_name": "Woo",
+        }
+        response = self.client.post(self.url, data=form_data)
+        self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(Email.objects.filter(recipients=[self.email], subject="Verify Account").exists())
+
+
+class SignUpRaceTest(TransactionTestCase):
+    """Duplicate signups at the same time, each request in its own thread and database connection."""
+
+    def sign_up(self, barrier, email):
+        client = Client()
+        barrier.wait()
+        try:
+            return client.post(reverse("users:signup"), {"email": email, "password": DEFAULT_PASSWORD})
+        finally:
+            connections.close_all()
+
+    def test_parallel_duplicate_signups(self):
+        emails = ["race@neuralia.co", "Race@neuralia.co", "RACE@neuralia.co", "race@neuralia.co"] * 2
+        barrier = threading.Barrier(len(emails))
+        with ThreadPoolExecutor(len(emails)) as executor:
+            responses = list(executor.map(self.sign_up, [barrier] * len(emails), emails))
+
+        self.assertEqual(sorted(response.status_code for response in responses), [200] * (len(emails) - 1) + [302])
+        for response in responses:
+            if response.status_code == 200:
+                self.assertContains(response, "That email is already taken")
+        self.assertEqual(User.objects.with_email("race@neuralia.co").count(), 1)
+
 
 class UserProfileViewTest(TestCase):
     def setUp(self) -> None:
@@ -120,6 +192,141 @@ class UserProfileViewTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 404)
 
+    def test_cached_profile(self):
+        viewer = UserFactory()
+        self.client.force_login(viewer)
+        profile_cache().clear()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, self.user.first_name)
+        self.assertEqual(profile_cache_stats(), {"hits": 0, "misses": 1})
+
+        # the session and the viewer come from the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, self.user.first_name)
+        self.assertNotContains(response, reverse("users:update"))
+        self.assertEqual(profile_cache_stats(), {"hits": 1, "misses": 1})
+
+    @override_settings(PROFILE_CACHE_ALIAS=None)
+    def test_without_shared_cache(self):
+        self.client.force_login(UserFactory())
+        self.client.get(self.url)
+        # without User.save() signals, as the invalidation of another worker's local memory cache
+        User.objects.filter(pk=self.user.pk).update(bio="Neuralia's bio")
+        response = self.client.get(self.url)
+        self.assertContains(response, "Neuralia&#x27;s bio")
+
+    def test_cached_profile_invalidated_on_save(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, "Neuralia's bio")
+
+        self.user.bio = "Neuralia's bio"
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Neuralia&#x27;s bio")
+
+    def test_conditional_get(self):
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        for headers in (
+            {"HTTP_IF_NONE_MATCH": response["ETag"]},
+            {"HTTP_IF_MODIFIED_SINCE": response["Last-Modified"]},
+        ):
+            with self.subTest(headers=headers):
+                # the validator comes from the cached profile, nothing is rendered
+                with self.assertNumQueries(0):
+                    not_modified = self.client.get(self.url, **headers)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.templates, [])
+                self.assertEqual(not_modified["ETag"], response["ETag"])
+
+    def test_conditional_get_without_cached_profile(self):
+        self.client.force_login(UserFactory())
+        etag = self.client.get(self.url)["ETag"]
+        invalidate_profile(self.user.username)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        # the full row, that a 200 would render as well
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"users_user"."bio"', queries[0]["sql"])
+
+    def test_conditional_get_after_changes(self):
+        viewer = UserFactory()
+        self.client.force_login(viewer)
+        etag = self.client.get(self.url)["ETag"]
+
+        self.user.bio = "Neuralia's bio"
+        self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Neuralia&#x27;s bio")
+        etag = response["ETag"]
+
+        # another user on the same browser
+        self.client.force_login(UserFactory())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class UserSearchViewTest(TestCase):
+    def setUp(self):
+        self.url = reverse("users:search")
+        self.anton = UserFactory(first_name="Anton", last_name="Larikova", bio="")
+        self.john = UserFactory(first_name="John", last_name="Woo", bio="Anton's best friend")
+        self.client.force_login(UserFactory(first_name="Viewer", last_name="Viewer"))
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous(self):
+        self.client.logout()
+        response = self.client.get(self.url, {"q": "anton"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_empty_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["users"]), [])
+
+    def test_ranked_full_text_search(self):
+        response = self.search("anton")
+        self.assertEqual(list(response.context["users"]), [self.anton, self.john])
+        self.assertContains(response, self.anton.get_absolute_url())
+
+    def test_search_vector_follows_updates(self):
+        self.john.bio = "plays the cello"
+        self.john.save()
+        self.assertEqual(list(self.search("anton").context["users"]), [self.anton])
+        self.assertEqual(list(self.search("cello").context["users"]), [self.john])
+
+    def test_typo_fallback(self):
+        response = self.search("Larikovva")
+        self.assertEqual(list(response.context["users"]), [self.anton])
+
+    def test_no_result(self):
+        response = self.search("zzzzzz")
+        self.assertEqual(list(response.context["users"]), [])
+        self.assertContains(response, "No user found")
+
+    def test_pagination(self):
+        User.objects.bulk_create(
+            [UserFactory.build(first_name="Anton", email=f"anton{i}@neuralia.co") for i in range(25)]
+        )
+        response = self.search("anton")
+        self.assertEqual(len(response.context["users"]), 20)
+        self.assertContains(response, "page=2")
+        response = self.search("anton", page=2)
+        self.assertEqual(len(response.context["users"]), 7)
+
 
 class UpdateProfileViewTest(TestCase):
     def setUp(self) -> None:
@@ -163,6 +370,8 @@ class UpdateProfileViewTest(TestCase):
             "bio": "work like a captain, play like a pirat",
             "birthdate": date(1978, 5, 17),
         }
+        # warm the profile cache
+        self.client.get(self.user.get_absolute_url())
         response = self.client.post(self.url, data=form_data)
         self.assertRedirects(response, self.user.get_absolute_url(), status_code=302)
 
@@ -173,6 +382,10 @@ class UpdateProfileViewTest(TestCase):
         self.assertEqual(user.bio, form_data["bio"])
         self.assertEqual(user.birthdate, form_data["birthdate"])
 
+        response = self.client.get(self.user.get_absolute_url())
+        self.assertContains(response, form_data["last_name"])
+        self.assertGreater(user.updated_at, self.user.updated_at)
+
 
 class UpdatePasswordViewTest(TestCase):
     @classmethod
@@ -363,6 +576,24 @@ class complete_verificationTest(TestCase):
         self.assertTrue(user.email_secret)
         self.assertFalse(user.email_verified)
 
+    def test_valid_token(self):
+        user = UserFactory()
+        url = reverse("users:complete-verification", kwargs={"key": make_email_verification_token(user)})
+        response = self.client.get(url)
+        self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+
+        user.refresh_from_db()
+        self.assertTrue(user.email_verified)
+
+    def test_legacy_secret_disabled(self):
+        user = UserFactory(email_secret="neuralia.co")
+        with self.settings(EMAIL_SECRET_VERIFICATION=False):
+            response = self.client.get(reverse("users:complete-verification", kwargs={"key": user.email_secret}))
+        self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+
+        user.refresh_from_db()
+        self.assertFalse(user.email_verified)
+
     def test_valid_verification(self):
         user = UserFactory(email_secret="neuralia.co")
         response = self.client.get(reverse("users:complete-verification", kwargs={"key": user.email_secret}))
@@ -381,6 +612,61 @@ class log_outTest(TestCase):
         self.assertRedirects(response, reverse("home:homepage"), status_code=302)
 
 
+class SessionWritesTest(TestCase):
+    """Writes to the django_session table issued by each view."""
+
+    def setUp(self):
+        self.user = UserFactory()
+
+    def session_writes(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data)
+        statements = [query["sql"].split()[0] for query in ctx.captured_queries if '"django_session"' in query["sql"]]
+        return response, [statement for statement in statements if statement != "SELECT"]
+
+    def test_login(self):
+        data = {"email": self.user.email, "password": DEFAULT_PASSWORD}
+        response, writes = self.session_writes("post", reverse("users:login"), data)
+        self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+        self.assertEqual(writes, ["INSERT"])
+
+    def test_signup(self):
+        data = {
+            "first_name": "Anton",
+            "last_name": "Larikova",
+            "email": "anton@neuralia.co",
+            "password": DEFAULT_PASSWORD,
+            "password1": DEFAULT_PASSWORD,
+        }
+        response, writes = self.session_writes("post", reverse("users:signup"), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(writes, ["INSERT"])
+
+    def test_log_out(self):
+        self.client.force_login(self.user)
+        _, writes = self.session_writes("get", reverse("users:logout"))
+        self.assertEqual(writes, ["DELETE"])
+
+    def test_complete_verification(self):
+        key = make_email_verification_token(self.user)
+        response, writes = self.session_writes("get", reverse("users:complete-verification", kwargs={"key": key}))
+        self.assertRedirects(response, reverse("home:homepage"), status_code=302)
+        self.assertEqual(writes, [])
+
+    def test_update_profile(self):
+        self.client.force_login(self.user)
+        data = {"first_name": "Anton", "last_name": "Larikova", "country": "FR", "bio": "", "birthdate": ""}
+        response, writes = self.session_writes("post", reverse("users:update"), data)
+        self.assertRedirects(response, self.user.get_absolute_url(), status_code=302)
+        self.assertEqual(writes, [])
+
+    def test_browsing(self):
+        self.client.force_login(self.user)
+        for url in [reverse("home:homepage"), self.user.get_absolute_url(), reverse("users:update")]:
+            _, writes = self.session_writes("get", url)
+            self.assertEqual(writes, [], url)
+
+
 class HostViewTest(TestCase):
     def setUp(self) -> None:
         self.url = reverse("users:host")
@@ -404,3 +690,100 @@ class HostViewTest(TestCase):
         self.client.force_login(user)
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get(self):
+        self.client.force_login(HostFactory())
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+
+    def test_conditional_get_after_permission_changes(self):
+        host = HostFactory()
+        group = Group.objects.create(name="Staff")
+        group.permissions.add(Permission.objects.get(codename="view_user"))
+        self.client.force_login(host)
+        etag = self.client.get(self.url)["ETag"]
+
+        # neither saves the host
+        host.groups.add(group)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        host.user_permissions.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(PERMISSION_CACHE_ALIAS=None)
+    def test_conditional_get_without_permission_cache(self):
+        host = HostFactory()
+        self.client.force_login(host)
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # without m2m_changed signals, as a change made by another worker
+        group = Group.objects.create(name="Staff")
+        group.permissions.add(Permission.objects.get(codename="view_user"))
+        User.groups.through.objects.create(user=host, group=group)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class AsyncViewsTest(TestCase):
+    """The async views through the ASGI handler and the async middleware chain."""
+
+    def setUp(self):
+        self.user = UserFactory()
+
+    def post(self, url, data):
+        # urlencoded, AsyncClient of Django 4.1 fails to read back its multipart bodies
+        return self.async_client.post(url, urlencode(data), content_type="application/x-www-form-urlencoded")
+
+    async def test_homepage(self):
+        response = await self.async_client.get(reverse("home:homepage"))
+        self.assertContains(response, reverse("users:login"))
+
+    async def test_login_and_profile(self):
+        url = reverse("users:profile", kwargs={"slug": self.user.username})
+        response = await self.async_client.get(url)
+        self.assertRedirects(response, f"{reverse('users:login')}?next={url}", fetch_redirect_response=False)
+
+        response = await self.post(reverse("users:login"), {"email": self.user.email, "password": "wrongpassword"})
+        self.assertContains(response, "Password is wrong")
+        response = await self.post(reverse("users:login"), {"email": self.user.email, "password": DEFAULT_PASSWORD})
+        self.assertRedirects(response, reverse("home:homepage"), fetch_redirect_response=False)
+
+        response = await self.async_client.get(url)
+        self.assertContains(response, self.user.first_name)
+        response = await self.async_client.get(reverse("users:profile", kwargs={"slug": uuid.uuid4()}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_signup_and_verification(self):
+        response = await self.post(reverse("users:signup"), {"email": self.user.email, "password": DEFAULT_PASSWORD})
+        self.assertContains(response, "That email is already taken")
+
+        response = await self.post(
+            reverse("users:signup"), {"email": "async@neuralia.co", "password": DEFAULT_PASSWORD}
+        )
+        self.assertRedirects(response, reverse("home:homepage"), fetch_redirect_response=False)
+        user = await User.objects.aget(email="async@neuralia.co")
+        self.assertTrue(user.check_password(DEFAULT_PASSWORD))
+
+        url = reverse("users:complete-verification", kwargs={"key": make_email_verification_token(user)})
+        await self.async_client.get(url)
+        self.assertTrue((await User.objects.aget(pk=user.pk)).email_verified)
+
+    @override_settings(THROTTLE_RATES={"login": {"ip": "1/m"}})
+    async def test_throttled_login(self):
+        throttling.local_counts.clear()
+        for status_code in (200, 429):
+            response = await self.post(reverse("users:login"), {"email": self.user.email, "password": "wrongpassword"})
+            self.assertEqual(response.status_code, status_code)
+
+    def test_asgi_application(self):
+        from config.asgi import application  # pylint: disable=import-outside-toplevel
+
+        self.assertTrue(asyncio.iscoroutinefunction(application.__call__))